@@ -0,0 +1,46 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from database import Database
+
+
+class AsyncDatabase:
+    """Coroutine facade over Database for async Flet handlers.
+
+    Every call runs on a dedicated executor, so the event loop never waits on SQLite.
+    Database hands each executor thread its own connection, which keeps SQLite's
+    one-connection-per-thread rule intact.
+    """
+
+    def __init__(self, db=None, max_workers=4):
+        self.db = db if db is not None else Database()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trellomize-db")
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name in ("conn", "transaction"):
+            raise AttributeError(f"'{type(self).__name__}' does not expose '{name}', use run() or run_in_transaction()")
+        attribute = getattr(self.db, name)
+        if not callable(attribute):
+            return attribute
+
+        async def method(*args, **kwargs):
+            return await self.run(attribute, *args, **kwargs)
+
+        method.__name__ = name
+        return method
+
+    async def run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    async def run_in_transaction(self, function, *args, **kwargs):
+        # A transaction belongs to one connection, so the whole unit of work runs in one executor call
+        def unit_of_work():
+            with self.db.transaction():
+                return function(self.db, *args, **kwargs)
+
+        return await self.run(unit_of_work)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,96 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Pages copied per backup step, and the pause between steps that lets writers in
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+
+# Scheduled backups: how often, where, and how many to keep
+BACKUP_INTERVAL = 6 * 60 * 60
+BACKUP_DIRECTORY = "backups"
+BACKUP_KEEP = 7
+
+
+class BackupError(Exception):
+    pass
+
+
+def archive_backup_path(destination):
+    # The archive database is copied next to the main backup, named like Database.archive_file
+    return f"{os.path.splitext(destination)[0]}-archive.db"
+
+
+def backup_database(db_file, destination, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
+    """Copy a live database with the online backup API and verify the copy before publishing it.
+
+    The copy is written next to destination and only renamed into place once
+    PRAGMA integrity_check passes, so a failed backup never replaces a good one.
+    """
+    temporary = destination + ".partial"
+    source = sqlite3.connect(db_file)
+    target = sqlite3.connect(temporary)
+    try:
+        source.backup(target, pages=pages, sleep=sleep)
+        # The copy inherits WAL mode from the source; a backup should be a single file
+        target.execute("PRAGMA journal_mode=DELETE")
+        result = target.execute("PRAGMA integrity_check").fetchall()
+        if result != [("ok",)]:
+            raise BackupError(f"Backup of '{db_file}' failed integrity check: {'; '.join(row[0] for row in result)}")
+    except BaseException:
+        target.close()
+        os.remove(temporary)
+        raise
+    finally:
+        source.close()
+    target.close()
+    os.replace(temporary, destination)
+    return destination
+
+
+class BackupScheduler:
+    """Backs the database up every interval seconds on a daemon thread, keeping the newest copies."""
+
+    def __init__(self, db, directory=BACKUP_DIRECTORY, interval=BACKUP_INTERVAL, keep=BACKUP_KEEP):
+        self.db = db
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self._stop = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="trellomize-backup", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def backup_now(self):
+        destination = os.path.join(self.directory, f"{os.path.splitext(os.path.basename(self.db.db_file))[0]}-{datetime.now():%Y%m%d-%H%M%S-%f}.db")
+        self.db.backup(destination)
+        self._prune()
+        return destination
+
+    def _prune(self):
+        prefix = os.path.splitext(os.path.basename(self.db.db_file))[0] + "-"
+        backups = sorted(name for name in os.listdir(self.directory) if name.startswith(prefix) and name.endswith(".db") and not name.endswith("-archive.db"))
+        for name in backups[:-self.keep] if self.keep else []:
+            path = os.path.join(self.directory, name)
+            os.remove(path)
+            if os.path.exists(archive_backup_path(path)):
+                os.remove(archive_backup_path(path))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                destination = self.backup_now()
+                logger.info(f"Scheduled backup written to '{destination}'")
+            except Exception:
+                logger.exception("Scheduled backup failed")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        atexit.unregister(self.close)
@@ -1,15 +1,27 @@
 import sqlite3
-import hashlib
 import re
 from project import Project
 from user import User
-from datetime import datetime
+from datetime import datetime, timedelta
 from history import History
 import uuid
 from flet import *
 from task import *
 import tempfile
 import os
+import threading
+from write_behind import WriteBehindJournal
+from identity_map import IdentityMap
+from search_hit import SearchHit
+from principal import Principal
+from passwords import PasswordHasher, legacy_hash
+from backup import BACKUP_PAGES_PER_STEP, BACKUP_STEP_SLEEP, archive_backup_path, backup_database
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -19,12 +31,578 @@ import os
 
 DB_FILE = 'database.db'
 
+# How long a connection waits on a locked database before raising "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+# Number of User/Project instances kept in the identity map
+IDENTITY_MAP_CAPACITY = 2048
+
+# Rows per page for comment and history windows
+PAGE_SIZE = 20
+
+# Sort orders accepted by get_tasks_assigned_to
+TASK_ORDERS = {
+    "due": "t.end_datetime ASC, t.id ASC",
+    "start": "t.start_datetime DESC, t.id ASC",
+    "priority": "t.priority_rank ASC, t.end_datetime ASC, t.id ASC",
+}
+
+# Keep IN (...) lists below the default host parameter limit of older SQLite builds
+MAX_QUERY_PARAMETERS = 999
+
+
+def add_foreign_key_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_project_id ON tasks (project_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_project_members_user_id ON project_members (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_leader_id ON projects (leader_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_task_assignees_user_id ON task_assignees (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_comments_task_id ON comments (task_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_task_history_task_id ON task_history (task_id)")
+
+
+# Timestamps are stored as integer microseconds since 1970-01-01 in naive local time,
+# which sorts numerically and decodes with one timedelta addition instead of strptime
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_timestamp(value):
+    if isinstance(value, datetime):
+        return (value - EPOCH) // ONE_MICROSECOND
+    return value
+
+
+def decode_timestamp(value):
+    if isinstance(value, int):
+        return EPOCH + timedelta(microseconds=value)
+    return datetime.fromisoformat(value)
+
+
+def _text_to_epoch_us(value):
+    try:
+        return encode_timestamp(datetime.fromisoformat(value))
+    except (TypeError, ValueError):
+        return value
+
+
+def store_timestamps_as_integers(conn):
+    conn.create_function("text_to_epoch_us", 1, _text_to_epoch_us, deterministic=True)
+
+    conn.execute("""
+        CREATE TABLE tasks_new (
+            id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            start_datetime INTEGER NOT NULL,
+            end_datetime INTEGER NOT NULL,
+            priority TEXT NOT NULL,
+            status TEXT NOT NULL,
+            FOREIGN KEY (project_id) REFERENCES projects(id)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO tasks_new
+        SELECT id, project_id, title, description, text_to_epoch_us(start_datetime), text_to_epoch_us(end_datetime), priority, status
+        FROM tasks
+    """)
+
+    conn.execute("""
+        CREATE TABLE comments_new (
+            id INTEGER PRIMARY KEY,
+            task_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            FOREIGN KEY (task_id) REFERENCES tasks(id)
+        )
+    """)
+    conn.execute("INSERT INTO comments_new SELECT id, task_id, username, content, text_to_epoch_us(timestamp) FROM comments")
+
+    conn.execute("""
+        CREATE TABLE task_history_new (
+            id INTEGER PRIMARY KEY,
+            task_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            author TEXT NOT NULL,
+            FOREIGN KEY (task_id) REFERENCES tasks(id)
+        )
+    """)
+    conn.execute("INSERT INTO task_history_new SELECT id, task_id, action, text_to_epoch_us(timestamp), author FROM task_history")
+
+    for table in ("tasks", "comments", "task_history"):
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+    conn.execute("CREATE INDEX idx_tasks_project_id ON tasks (project_id)")
+    conn.execute("CREATE INDEX idx_comments_task_id ON comments (task_id, timestamp)")
+    conn.execute("CREATE INDEX idx_task_history_task_id ON task_history (task_id, timestamp)")
+
+
+def add_full_text_search(conn):
+    # External-content FTS5 indexes keyed on the source rowids; triggers keep them in sync
+    conn.execute("CREATE VIRTUAL TABLE tasks_fts USING fts5(title, description, content='tasks', content_rowid='rowid')")
+    _create_tasks_fts_triggers(conn)
+
+    conn.execute("CREATE VIRTUAL TABLE comments_fts USING fts5(content, content='comments', content_rowid='id')")
+    _create_comments_fts_triggers(conn)
+
+    conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO comments_fts (comments_fts) VALUES ('rebuild')")
+
+
+def _create_tasks_fts_triggers(conn):
+    conn.execute("""
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+            INSERT INTO tasks_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description);
+        END
+    """)
+
+
+def _create_comments_fts_triggers(conn):
+    conn.execute("""
+        CREATE TRIGGER comments_fts_insert AFTER INSERT ON comments BEGIN
+            INSERT INTO comments_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER comments_fts_delete AFTER DELETE ON comments BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER comments_fts_update AFTER UPDATE OF content ON comments BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO comments_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    """)
+
+
+def cover_task_assignees_by_user(conn):
+    # (user_id, task_id) answers "tasks assigned to me" from the index alone
+    conn.execute("DROP INDEX IF EXISTS idx_task_assignees_user_id")
+    conn.execute("CREATE INDEX idx_task_assignees_user_id ON task_assignees (user_id, task_id)")
+
+
+def add_project_task_counts(conn):
+    # One row per (project, status, priority) combination, kept current by triggers on tasks
+    conn.execute("""
+        CREATE TABLE project_task_counts (
+            project_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (project_id, status, priority)
+        ) WITHOUT ROWID
+    """)
+    _create_task_count_triggers(conn)
+    conn.execute("""
+        INSERT INTO project_task_counts (project_id, status, priority, count)
+        SELECT project_id, status, priority, COUNT(*) FROM tasks GROUP BY project_id, status, priority
+    """)
+
+
+def _create_task_count_triggers(conn):
+    conn.execute("""
+        CREATE TRIGGER project_task_counts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO project_task_counts (project_id, status, priority, count) VALUES (new.project_id, new.status, new.priority, 1)
+            ON CONFLICT (project_id, status, priority) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER project_task_counts_delete AFTER DELETE ON tasks BEGIN
+            UPDATE project_task_counts SET count = count - 1
+            WHERE project_id = old.project_id AND status = old.status AND priority = old.priority;
+            DELETE FROM project_task_counts
+            WHERE project_id = old.project_id AND status = old.status AND priority = old.priority AND count <= 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER project_task_counts_update AFTER UPDATE OF project_id, status, priority ON tasks
+        WHEN old.project_id IS NOT new.project_id OR old.status IS NOT new.status OR old.priority IS NOT new.priority
+        BEGIN
+            UPDATE project_task_counts SET count = count - 1
+            WHERE project_id = old.project_id AND status = old.status AND priority = old.priority;
+            DELETE FROM project_task_counts
+            WHERE project_id = old.project_id AND status = old.status AND priority = old.priority AND count <= 0;
+            INSERT INTO project_task_counts (project_id, status, priority, count) VALUES (new.project_id, new.status, new.priority, 1)
+            ON CONFLICT (project_id, status, priority) DO UPDATE SET count = count + 1;
+        END
+    """)
+
+
+def index_archived_tasks(conn):
+    # Lets the archiver find archived tasks without scanning the live ones
+    conn.execute("CREATE INDEX idx_tasks_archived ON tasks (end_datetime) WHERE status = 'ARCHIVED'")
+
+
+def index_user_names_nocase(conn):
+    # Case-insensitive prefix searches on username and email become index range scans
+    conn.execute("CREATE INDEX idx_users_username_nocase ON users (username COLLATE NOCASE)")
+    conn.execute("CREATE INDEX idx_users_email_nocase ON users (email COLLATE NOCASE)")
+
+
+def add_task_priority_rank(conn):
+    # A virtual column costs no storage; indexing it lets the board read each project
+    # already grouped by status and ordered by priority
+    conn.execute("""
+        ALTER TABLE tasks ADD COLUMN priority_rank INTEGER
+        GENERATED ALWAYS AS (CASE priority WHEN 'CRITICAL' THEN 0 WHEN 'HIGH' THEN 1 WHEN 'MEDIUM' THEN 2 ELSE 3 END) VIRTUAL
+    """)
+    conn.execute("CREATE INDEX idx_tasks_board ON tasks (project_id, status, priority_rank)")
+
+
+def autoincrement_comment_and_history_ids(conn):
+    # Archived rows leave main, and a plain INTEGER PRIMARY KEY would hand their ids out again
+    conn.execute("""
+        CREATE TABLE comments_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            FOREIGN KEY (task_id) REFERENCES tasks(id)
+        )
+    """)
+    conn.execute("INSERT INTO comments_new SELECT id, task_id, username, content, timestamp FROM comments")
+    conn.execute("""
+        CREATE TABLE task_history_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            author TEXT NOT NULL,
+            FOREIGN KEY (task_id) REFERENCES tasks(id)
+        )
+    """)
+    conn.execute("INSERT INTO task_history_new SELECT id, task_id, action, timestamp, author FROM task_history")
+
+    for table in ("comments", "task_history"):
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        # Continue above every id already used, including those of rows that now live in the archive
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+        conn.execute(f"""
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT ?, IFNULL(MAX(id), 0) FROM (SELECT MAX(id) AS id FROM main.{table} UNION ALL SELECT MAX(source_id) FROM archive.{table})
+        """, (table,))
+
+    conn.execute("CREATE INDEX idx_comments_task_id ON comments (task_id, timestamp)")
+    conn.execute("CREATE INDEX idx_task_history_task_id ON task_history (task_id, timestamp)")
+    # Dropping comments dropped its triggers; the FTS rowids are unchanged so no rebuild is needed
+    _create_comments_fts_triggers(conn)
+
+
+def give_tasks_a_stable_rowid(conn):
+    # tasks_fts is keyed on the rowid of tasks, which VACUUM may renumber while the primary key is TEXT.
+    # An INTEGER PRIMARY KEY column makes the rowid part of the row; existing values are kept.
+    conn.execute("""
+        CREATE TABLE tasks_new (
+            id TEXT NOT NULL UNIQUE,
+            project_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            start_datetime INTEGER NOT NULL,
+            end_datetime INTEGER NOT NULL,
+            priority TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority_rank INTEGER GENERATED ALWAYS AS (CASE priority WHEN 'CRITICAL' THEN 0 WHEN 'HIGH' THEN 1 WHEN 'MEDIUM' THEN 2 ELSE 3 END) VIRTUAL,
+            seq INTEGER PRIMARY KEY,
+            FOREIGN KEY (project_id) REFERENCES projects(id)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO tasks_new (seq, id, project_id, title, description, start_datetime, end_datetime, priority, status)
+        SELECT rowid, id, project_id, title, description, start_datetime, end_datetime, priority, status FROM tasks
+    """)
+    conn.execute("DROP TABLE tasks")
+    conn.execute("ALTER TABLE tasks_new RENAME TO tasks")
+
+    conn.execute("CREATE INDEX idx_tasks_project_id ON tasks (project_id)")
+    conn.execute("CREATE INDEX idx_tasks_archived ON tasks (end_datetime) WHERE status = 'ARCHIVED'")
+    conn.execute("CREATE INDEX idx_tasks_board ON tasks (project_id, status, priority_rank)")
+    # Dropping tasks dropped its triggers; rowids are unchanged so the search index stays valid
+    _create_tasks_fts_triggers(conn)
+    _create_task_count_triggers(conn)
+
+
+def scope_search_by_project(conn):
+    # Each indexed row carries a token for its project, so search can restrict MATCH to the
+    # user's projects before ranking. The tables keep their own copy of the text, which lets
+    # triggers delete by rowid without knowing the old project of a comment.
+    for trigger in ("tasks_fts_insert", "tasks_fts_delete", "tasks_fts_update", "comments_fts_insert", "comments_fts_delete", "comments_fts_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE tasks_fts")
+    conn.execute("DROP TABLE comments_fts")
+
+    conn.execute("CREATE VIRTUAL TABLE tasks_fts USING fts5(title, description, project)")
+    conn.execute("CREATE VIRTUAL TABLE comments_fts USING fts5(content, project)")
+    # The project token matches every row it is on, so it must not count towards relevance
+    conn.execute("INSERT INTO tasks_fts (tasks_fts, rank) VALUES ('rank', 'bm25(1.0, 1.0, 0.0)')")
+    conn.execute("INSERT INTO comments_fts (comments_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')")
+
+    conn.execute("""
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description, project) VALUES (new.rowid, new.title, new.description, 'p' || hex(new.project_id));
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.rowid;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER tasks_fts_update AFTER UPDATE OF title, description, project_id ON tasks BEGIN
+            UPDATE tasks_fts SET title = new.title, description = new.description, project = 'p' || hex(new.project_id) WHERE rowid = new.rowid;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER tasks_fts_move AFTER UPDATE OF project_id ON tasks WHEN old.project_id IS NOT new.project_id BEGIN
+            UPDATE comments_fts SET project = 'p' || hex(new.project_id) WHERE rowid IN (SELECT id FROM comments WHERE task_id = new.id);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER comments_fts_insert AFTER INSERT ON comments BEGIN
+            INSERT INTO comments_fts (rowid, content, project)
+            VALUES (new.id, new.content, (SELECT 'p' || hex(project_id) FROM tasks WHERE id = new.task_id));
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER comments_fts_delete AFTER DELETE ON comments BEGIN
+            DELETE FROM comments_fts WHERE rowid = old.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER comments_fts_update AFTER UPDATE OF content ON comments BEGIN
+            UPDATE comments_fts SET content = new.content WHERE rowid = new.id;
+        END
+    """)
+    _populate_search_index(conn)
+
+
+def _populate_search_index(conn):
+    conn.execute("DELETE FROM tasks_fts")
+    conn.execute("DELETE FROM comments_fts")
+    conn.execute("INSERT INTO tasks_fts (rowid, title, description, project) SELECT rowid, title, description, 'p' || hex(project_id) FROM tasks")
+    conn.execute("""
+        INSERT INTO comments_fts (rowid, content, project)
+        SELECT c.id, c.content, 'p' || hex(t.project_id) FROM comments c LEFT JOIN tasks t ON t.id = c.task_id
+    """)
+
+
+def _project_token(project_id):
+    # Same token the triggers store: 'p' followed by the hex of the UTF-8 project id
+    return f'"p{project_id.encode().hex()}"'
+
+
+# Schema migrations in the order they are applied. PRAGMA user_version stores how many
+# of them a database file has already run, so append new ones and never reorder.
+MIGRATIONS = [
+    add_foreign_key_indexes,
+    store_timestamps_as_integers,
+    add_full_text_search,
+    cover_task_assignees_by_user,
+    add_project_task_counts,
+    index_archived_tasks,
+    index_user_names_nocase,
+    add_task_priority_rank,
+    autoincrement_comment_and_history_ids,
+    give_tasks_a_stable_rowid,
+    scope_search_by_project,
+]
+
+# Archived tasks and their dependents live in a second database attached to every connection as
+# "archive". This is its initial schema; ARCHIVE_MIGRATIONS upgrade it like MIGRATIONS do for main.
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.tasks (
+        id TEXT PRIMARY KEY,
+        project_id TEXT NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        start_datetime INTEGER NOT NULL,
+        end_datetime INTEGER NOT NULL,
+        priority TEXT NOT NULL,
+        status TEXT NOT NULL
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS archive.task_assignees (task_id TEXT NOT NULL, user_id INTEGER NOT NULL, PRIMARY KEY (task_id, user_id))",
+    "CREATE TABLE IF NOT EXISTS archive.comments (id INTEGER PRIMARY KEY, task_id TEXT NOT NULL, username TEXT NOT NULL, content TEXT NOT NULL, timestamp INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_comments_task_id ON comments (task_id, timestamp)",
+    "CREATE TABLE IF NOT EXISTS archive.task_history (id INTEGER PRIMARY KEY, task_id TEXT NOT NULL, action TEXT NOT NULL, timestamp INTEGER NOT NULL, author TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_task_history_task_id ON task_history (task_id, timestamp)",
+]
+
+
+
+def archive_source_ids(conn):
+    # Archived comments and history get their own ids and remember the id they had in main
+    conn.execute("""
+        CREATE TABLE archive.comments_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_id INTEGER NOT NULL,
+            task_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            UNIQUE (task_id, source_id)
+        )
+    """)
+    conn.execute("INSERT INTO archive.comments_new (source_id, task_id, username, content, timestamp) SELECT id, task_id, username, content, timestamp FROM archive.comments ORDER BY id")
+    conn.execute("""
+        CREATE TABLE archive.task_history_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_id INTEGER NOT NULL,
+            task_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            author TEXT NOT NULL,
+            UNIQUE (task_id, source_id)
+        )
+    """)
+    conn.execute("INSERT INTO archive.task_history_new (source_id, task_id, action, timestamp, author) SELECT id, task_id, action, timestamp, author FROM archive.task_history ORDER BY id")
+    for table in ("comments", "task_history"):
+        conn.execute(f"DROP TABLE archive.{table}")
+        conn.execute(f"ALTER TABLE archive.{table}_new RENAME TO {table}")
+    conn.execute("CREATE INDEX archive.idx_comments_task_id ON comments (task_id, timestamp)")
+    conn.execute("CREATE INDEX archive.idx_task_history_task_id ON task_history (task_id, timestamp)")
+
+
+# Applied to the archive in order and tracked with PRAGMA archive.user_version
+ARCHIVE_MIGRATIONS = [
+    archive_source_ids,
+]
+
+# Tables moved by archive_tasks: the column that links each to a task, its columns in main and
+# in the archive, and the condition that finds the archive copy "a" of a main row "m"
+ARCHIVED_TABLES = [
+    ("task_assignees", "task_id", "task_id, user_id", "task_id, user_id", "a.task_id = m.task_id AND a.user_id = m.user_id"),
+    ("comments", "task_id", "id, task_id, username, content, timestamp", "source_id, task_id, username, content, timestamp", "a.task_id = m.task_id AND a.source_id = m.id"),
+    ("task_history", "task_id", "id, task_id, action, timestamp, author", "source_id, task_id, action, timestamp, author", "a.task_id = m.task_id AND a.source_id = m.id"),
+    ("tasks", "id",
+     "id, project_id, title, description, start_datetime, end_datetime, priority, status",
+     "id, project_id, title, description, start_datetime, end_datetime, priority, status",
+     "a.id = m.id AND a.project_id = m.project_id AND a.title = m.title AND a.description IS m.description"
+     " AND a.start_datetime = m.start_datetime AND a.end_datetime = m.end_datetime AND a.priority = m.priority AND a.status = m.status"),
+]
+
+# Tasks moved per archive transaction
+ARCHIVE_BATCH_SIZE = 500
+
 class Database:
 
-    def __init__(self, DB_FILE = 'database.db' ):
+    def __init__(self, DB_FILE = 'database.db', password_hasher=None, archive_file=None):
         self.db_file = DB_FILE
-        self.conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+        self.archive_file = archive_file if archive_file is not None else f"{os.path.splitext(DB_FILE)[0]}-archive.db"
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        self.journal = None
+        self.identity_map = IdentityMap(IDENTITY_MAP_CAPACITY)
+        # Bumped whenever a user's row or memberships change, so cached session principals reload
+        self._principal_epochs = {}
+        self._principal_epochs_lock = threading.Lock()
+        self.password_hasher = password_hasher if password_hasher is not None else PasswordHasher()
         self.create_tables()
+        self.migrate()
+
+    @property
+    def conn(self):
+        # Every thread gets its own connection so Flet handlers never share cursor state
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        # WAL lets readers keep going while a writer commits
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_file,))
+        if conn.execute("PRAGMA archive.user_version").fetchone()[0] < len(ARCHIVE_MIGRATIONS):
+            self._migrate_archive(conn)
+
+        with self._connections_lock:
+            for thread in [thread for thread in self._connections if not thread.is_alive()]:
+                self._connections.pop(thread).close()
+            self._connections[threading.current_thread()] = conn
+        return conn
+
+    def enable_write_behind(self, max_batch=500, max_delay=0.5):
+        # Comments and task history are append-only, so they can be buffered and group-committed
+        if self.journal is None:
+            self.journal = WriteBehindJournal(self, max_batch, max_delay)
+        return self.journal
+
+    def flush_journal(self):
+        if self.journal is not None:
+            self.journal.flush()
+
+    def cache_stats(self):
+        return self.identity_map.stats()
+
+    def _invalidate_user(self, user_id):
+        self.identity_map.invalidate_where(lambda key, value: key[0] in ("user", "username") and value.get_id() == user_id)
+        with self._principal_epochs_lock:
+            self._principal_epochs[user_id] = self._principal_epochs.get(user_id, 0) + 1
+        if getattr(self._local, "transaction_depth", 0):
+            # Another thread may cache the old row before we commit, so invalidate again afterwards
+            self._local.pending_invalidations.append(user_id)
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        self.password_hasher.close()
+        with self._connections_lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    @contextmanager
+    def transaction(self):
+        # Mutators called inside the block skip their own commit; the outermost block
+        # commits once at the end or rolls everything back if an exception escapes.
+        depth = getattr(self._local, "transaction_depth", 0)
+        if depth == 0 and not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+        if depth == 0:
+            self._local.pending_invalidations = []
+        self._local.transaction_depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            self._local.transaction_depth = depth
+            if depth == 0:
+                self.conn.rollback()
+                # Entries loaded inside the block may describe rows that no longer exist
+                self.identity_map.clear()
+            raise
+        self._local.transaction_depth = depth
+        if depth == 0:
+            self.conn.commit()
+            for user_id in self._local.pending_invalidations:
+                self._invalidate_user(user_id)
+
+    def _commit(self):
+        if not getattr(self._local, "transaction_depth", 0):
+            self.conn.commit()
 
 
 
@@ -114,6 +692,39 @@ class Database:
 
         self.conn.commit()
 
+    def _migrate_archive(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA archive.user_version").fetchone()[0]
+            if version == 0:
+                for statement in ARCHIVE_SCHEMA:
+                    conn.execute(statement)
+            for migration in ARCHIVE_MIGRATIONS[version:]:
+                migration(conn)
+            conn.execute(f"PRAGMA archive.user_version = {len(ARCHIVE_MIGRATIONS)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def get_schema_version(self):
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self):
+        for version, migration in enumerate(MIGRATIONS, start=1):
+            if self.get_schema_version() >= version:
+                continue
+            # Re-check inside a write transaction in case another process migrated meanwhile
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.get_schema_version() < version:
+                    migration(self.conn)
+                    self.conn.execute(f"PRAGMA user_version = {version}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
     def add_project(self, project_id, project_name, leader_id, member_ids):
         query = "INSERT INTO projects (id, project_name, leader_id) VALUES (?, ?, ?)"
         self.conn.execute(query, (project_id, project_name, leader_id))
@@ -122,48 +733,145 @@ class Database:
         for member_id in member_ids:
             self.conn.execute(query, (project_id, member_id))
 
-        self.conn.commit()
+        self._commit()
+        for user_id in [leader_id, *member_ids]:
+            self._invalidate_user(user_id)
 
     def add_task(self, task):
         query = """INSERT INTO tasks (id, project_id, title, description, start_datetime, end_datetime, priority, status) 
                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
         self.conn.execute(query, (
-            task.get_task_id(), task.get_project_id(), task.get_title(), task.get_description(), task.get_start_datetime().strftime('%Y-%m-%d %H:%M:%S.%f')  ,
-            task.get_end_datetime().strftime('%Y-%m-%d %H:%M:%S.%f'), task.get_priority(), task.get_status()))
+            task.get_task_id(), task.get_project_id(), task.get_title(), task.get_description(), encode_timestamp(task.get_start_datetime()),
+            encode_timestamp(task.get_end_datetime()), task.get_priority(), task.get_status()))
 
         query = "INSERT INTO task_assignees (task_id, user_id) VALUES (?, ?)"
         for assignee in task.get_assignees():
             self.conn.execute(query, (task.get_task_id(), assignee))
 
-        self.conn.commit()
+        self._commit()
 
 
 
     def add_comment(self, task_id, username, content):
-        timestamp = datetime.now().isoformat()
+        timestamp = encode_timestamp(datetime.now())
         query = "INSERT INTO comments (task_id, username, content, timestamp) VALUES (?, ?, ?, ?)"
+        # Inside a transaction the row must commit or roll back with the rest of the block
+        if self.journal is not None and not getattr(self._local, "transaction_depth", 0):
+            self.journal.append(query, (task_id, username, content, timestamp))
+            return
         self.conn.execute(query, (task_id, username, content, timestamp))
-        self.conn.commit()
+        self._commit()
 
     def get_task_comments(self, task_id):
+        self.flush_journal()
         query = "SELECT username, content, timestamp FROM comments WHERE task_id = ?"
         results = self.conn.execute(query, (task_id,)).fetchall()
-        return [Comment(username=row[0], content=row[1], timestamp=row[2]) for row in results]
+        return [Comment(username=row[0], content=row[1], timestamp=decode_timestamp(row[2])) for row in results]
     
+    def backup(self, destination, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
+        self.flush_journal()
+        # main first: a task archived in between then lands in both copies rather than in neither
+        backup_database(self.db_file, destination, pages, sleep)
+        backup_database(self.archive_file, archive_backup_path(destination), pages, sleep)
+        return destination
+
+    def bulk_import(self, kind, records, batch_size=None):
+        # Imported here because importer builds on this module's timestamp helpers
+        from importer import IMPORT_BATCH_SIZE, BulkImporter
+        self.flush_journal()
+        return BulkImporter(self, batch_size or IMPORT_BATCH_SIZE).run(kind, records)
+
+    def search(self, user_id, query, limit=20):
+        # Quote every word so user input can never be parsed as FTS5 syntax. Only the last word,
+        # the one still being typed, is a prefix match: prefix phrases are the costly ones to rank.
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        terms = " ".join([*(f'"{word}"' for word in words[:-1]), f'"{words[-1]}"*'])
+        self.flush_journal()
+        query = """
+            SELECT project_id FROM project_members WHERE user_id = ?
+            UNION
+            SELECT id FROM projects WHERE leader_id = ?
+        """
+        project_ids = [row[0] for row in self.conn.execute(query, (user_id, user_id))]
+        if not project_ids:
+            return []
+        # The project filter is part of MATCH, so FTS5 only ranks rows the user may see
+        projects = " OR ".join(_project_token(project_id) for project_id in project_ids)
+        query = """
+            SELECT kind, task_id, project_id, title, snippet, rank FROM (
+                SELECT 'task' AS kind, t.id AS task_id, t.project_id, t.title, snippet, rank FROM (
+                    SELECT rowid, snippet(tasks_fts, -1, '[', ']', '...', 12) AS snippet, rank
+                    FROM tasks_fts WHERE tasks_fts MATCH :task_terms ORDER BY rank LIMIT :limit
+                ) hits JOIN tasks t ON t.rowid = hits.rowid
+                UNION ALL
+                SELECT 'comment', t.id, t.project_id, t.title, snippet, rank FROM (
+                    SELECT rowid, snippet(comments_fts, 0, '[', ']', '...', 12) AS snippet, rank
+                    FROM comments_fts WHERE comments_fts MATCH :comment_terms ORDER BY rank LIMIT :limit
+                ) hits JOIN comments c ON c.id = hits.rowid JOIN tasks t ON t.id = c.task_id
+            )
+            ORDER BY rank
+            LIMIT :limit
+        """
+        params = {
+            "task_terms": f"{{title description}} : ({terms}) AND project : ({projects})",
+            "comment_terms": f"content : ({terms}) AND project : ({projects})",
+            "limit": limit,
+        }
+        rows = self.conn.execute(query, params).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+    def rebuild_search_index(self):
+        # Repairs the search index should it ever drift from tasks and comments
+        _populate_search_index(self.conn)
+        self._commit()
+
+    def get_task_comments_page(self, task_id, limit=PAGE_SIZE, before=None):
+        self.flush_journal()
+        rows, earlier = self._keyset_page("SELECT id, username, content, timestamp FROM comments WHERE task_id = ?", (task_id,), limit, before)
+        return [Comment(username=row[1], content=row[2], timestamp=decode_timestamp(row[3])) for row in rows], earlier
+
+    def _keyset_page(self, query, params, limit, before):
+        # Walk (timestamp, id) backwards from the cursor so every page is an index range scan,
+        # however many rows came before it. Pages come back oldest first for display.
+        if before is not None:
+            timestamp, row_id = (int(part) for part in before.split(":"))
+            query += " AND (timestamp, id) < (?, ?)"
+            params += (timestamp, row_id)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        rows = self.conn.execute(query, params + (limit + 1,)).fetchall()
+        earlier = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            earlier = f"{rows[-1][-1]}:{rows[-1][0]}"
+        rows.reverse()
+        return rows, earlier
+
     def add_task_history(self, task_id, action, author):
-        timestamp = datetime.now().isoformat()
+        timestamp = encode_timestamp(datetime.now())
         query = "INSERT INTO task_history (task_id, action, timestamp, author) VALUES (?, ?, ?, ?)"
+        if self.journal is not None and not getattr(self._local, "transaction_depth", 0):
+            self.journal.append(query, (task_id, action, timestamp, author))
+            return
         self.conn.execute(query, (task_id, action, timestamp, author))
-        self.conn.commit()
+        self._commit()
 
     def get_task_history(self, task_id):
-        query = "SELECT action, author, timestamp FROM task_history WHERE task_id = ? ORDER BY timestamp ASC"
+        self.flush_journal()
+        query = "SELECT action, author, timestamp FROM task_history WHERE task_id = ? ORDER BY timestamp ASC, id ASC"
         results = self.conn.execute(query, (task_id,)).fetchall()
-        return [History(author=row[1], action=row[0], timestamp=row[2]) for row in results]
+        return [History(author=row[1], action=row[0], timestamp=decode_timestamp(row[2])) for row in results]
+
+    def get_task_history_page(self, task_id, limit=PAGE_SIZE, before=None):
+        self.flush_journal()
+        rows, earlier = self._keyset_page("SELECT id, action, author, timestamp FROM task_history WHERE task_id = ?", (task_id,), limit, before)
+        return [History(author=row[2], action=row[1], timestamp=decode_timestamp(row[3])) for row in rows], earlier
 
 
     def _hash_password(self, password):
-        return hashlib.sha256(password.encode()).hexdigest()
+        # Legacy unsalted format, only kept so old hashes can still be recognised
+        return legacy_hash(password)
 
     # def add_user(self, username, password, email):
     #     hashed_password = self._hash_password(password)
@@ -172,18 +880,18 @@ class Database:
     #     self.conn.commit()
 
     def add_user(self, username, password, email, active=1):
-        hashed_password = self._hash_password(password)
+        hashed_password = self.password_hasher.hash(password)
         query = "INSERT INTO users (username, password, email, active) VALUES (?, ?, ?, ?)"
         self.conn.execute(query, (username, hashed_password, email, active))
-        self.conn.commit()
+        self._commit()
     
 
 
     def add_admin(self, username, password):
-        hashed_password = self._hash_password(password)
+        hashed_password = self.password_hasher.hash(password)
         query = "INSERT INTO users (username, password, email, isadmin) VALUES (?, ?, ?, ?)"
         self.conn.execute(query, (username, hashed_password, "admin@example.com", True))
-        self.conn.commit()
+        self._commit()
 
     @staticmethod
     def create_admin(username, password, DB_FILE = 'database.db'  ):
@@ -213,51 +921,157 @@ class Database:
         return result is not None 
 
     def get_user(self, username, password):
-        hashed_password = self._hash_password(password)
-        query = "SELECT * FROM users WHERE username=? AND password=?"
-        return self.conn.execute(query, (username, hashed_password)).fetchone()
+        return self.verify_credentials(username, password)
+
+    def verify_credentials(self, username, password):
+        query = "SELECT * FROM users WHERE username=?"
+        result = self.conn.execute(query, (username,)).fetchone()
+        if result is None or not self.password_hasher.verify(password, result[2]):
+            return None
+        if self.password_hasher.needs_rehash(result[2]):
+            # Upgrade legacy or outdated hashes while the plain password is at hand
+            hashed_password = self.password_hasher.hash(password)
+            self.conn.execute("UPDATE users SET password=? WHERE id=? AND password=?", (hashed_password, result[0], result[2]))
+            self._commit()
+            self._invalidate_user(result[0])
+            result = (*result[:2], hashed_password, *result[3:])
+        return result
 
     def get_user_by_username(self, username):
+        user = self.identity_map.get(("username", username))
+        if user:
+            return user
         query = "SELECT * FROM users WHERE username=?"
         result = self.conn.execute(query, (username,)).fetchone()
-        projects = self.get_user_project_member(result[0])
-        projects.append(self.get_user_project_leader(result[0]))
         if result:
-            return User(result[0], result[1], result[2], result[3], result[5], result[4],projects)
+            return self._cache_user(result)
         else:
             return None
 
+    def _row_to_user(self, row):
+        return User(row[0], row[1], row[2], row[3], row[5], row[4], projects_loader=lambda: self.get_user_projects(row[0]))
+
+    def _cache_user(self, row):
+        # One instance serves lookups by id and by username, even if only one of the two keys is still cached
+        user = self.identity_map.peek(("user", row[0])) or self.identity_map.peek(("username", row[1])) or self._row_to_user(row)
+        self.identity_map.put(("username", row[1]), user)
+        return self.identity_map.put(("user", row[0]), user)
+
     def get_all_users(self):
         query = "SELECT * FROM users WHERE username != ?"
-        return [User(result[0], result[1], result[2], result[3], result[5], result[4]) for result in self.conn.execute(query,("",)).fetchall()]
-
+        return [self._row_to_user(result) for result in self.conn.execute(query,("",)).fetchall()]
+
+
+    def _user_prefix_filter(self, prefix, params):
+        # A half-open NOCASE range instead of LIKE, so idx_users_*_nocase can serve it
+        if not prefix:
+            return ""
+        params["low"] = prefix
+        params["high"] = prefix + "\U0010ffff"
+        return """
+            AND ((u.username COLLATE NOCASE >= :low AND u.username COLLATE NOCASE < :high)
+                 OR (u.email COLLATE NOCASE >= :low AND u.email COLLATE NOCASE < :high))
+        """
+
+    def search_users(self, prefix=None, limit=PAGE_SIZE, offset=0, exclude_ids=()):
+        # Active users whose username or email starts with prefix, ignoring case
+        params = {"limit": limit, "offset": offset}
+        prefix_filter = self._user_prefix_filter(prefix, params)
+        exclude_filter = ""
+        if exclude_ids:
+            exclude_filter = f"AND u.id NOT IN ({', '.join(f':exclude{i}' for i in range(len(exclude_ids)))})"
+            params.update({f"exclude{i}": user_id for i, user_id in enumerate(exclude_ids)})
+        query = f"""
+            SELECT u.* FROM users u
+            WHERE u.active = 1
+            {exclude_filter}
+            {prefix_filter}
+            ORDER BY u.username COLLATE NOCASE
+            LIMIT :limit OFFSET :offset
+        """
+        return [self._row_to_user(result) for result in self.conn.execute(query, params).fetchall()]
+
+    def get_addable_users(self, project_id, prefix=None, limit=PAGE_SIZE, offset=0):
+        # Active users who are neither the leader nor already members, ordered by username
+        params = {"project_id": project_id, "limit": limit, "offset": offset}
+        prefix_filter = self._user_prefix_filter(prefix, params)
+        query = f"""
+            SELECT u.* FROM users u
+            WHERE u.active = 1
+            AND u.id IS NOT (SELECT leader_id FROM projects WHERE id = :project_id)
+            AND NOT EXISTS (SELECT 1 FROM project_members m WHERE m.project_id = :project_id AND m.user_id = u.id)
+            {prefix_filter}
+            ORDER BY u.username COLLATE NOCASE
+            LIMIT :limit OFFSET :offset
+        """
+        return [self._row_to_user(result) for result in self.conn.execute(query, params).fetchall()]
+
+    def get_project_users(self, project_id, prefix=None, limit=PAGE_SIZE, offset=0):
+        # The project's leader and members
+        params = {"project_id": project_id, "limit": limit, "offset": offset}
+        prefix_filter = self._user_prefix_filter(prefix, params)
+        query = f"""
+            SELECT u.* FROM users u
+            WHERE u.id IN (
+                SELECT leader_id FROM projects WHERE id = :project_id
+                UNION
+                SELECT user_id FROM project_members WHERE project_id = :project_id
+            )
+            {prefix_filter}
+            ORDER BY u.username COLLATE NOCASE
+            LIMIT :limit OFFSET :offset
+        """
+        return [self._row_to_user(result) for result in self.conn.execute(query, params).fetchall()]
+
+    def get_assignable_users(self, task_id, prefix=None, limit=PAGE_SIZE, offset=0):
+        # The project's leader and members who are not yet assigned to the task
+        params = {"task_id": task_id, "limit": limit, "offset": offset}
+        prefix_filter = self._user_prefix_filter(prefix, params)
+        query = f"""
+            SELECT u.* FROM users u
+            WHERE u.id IN (
+                SELECT p.leader_id FROM tasks t JOIN projects p ON p.id = t.project_id WHERE t.id = :task_id
+                UNION
+                SELECT m.user_id FROM tasks t JOIN project_members m ON m.project_id = t.project_id WHERE t.id = :task_id
+            )
+            AND NOT EXISTS (SELECT 1 FROM task_assignees a WHERE a.task_id = :task_id AND a.user_id = u.id)
+            {prefix_filter}
+            ORDER BY u.username COLLATE NOCASE
+            LIMIT :limit OFFSET :offset
+        """
+        return [self._row_to_user(result) for result in self.conn.execute(query, params).fetchall()]
 
     def get_all_active_users(self):
         query = "SELECT * FROM users WHERE active = 1"
-        return [User(result[0], result[1], result[2], result[3], result[5], result[4]) for result in self.conn.execute(query).fetchall()]
+        return [self._row_to_user(result) for result in self.conn.execute(query).fetchall()]
 
     def get_all_inactive_users(self):
         query = "SELECT * FROM users WHERE active = 0"
-        return [User(result[0], result[1], result[2], result[3], result[5], result[4]) for result in self.conn.execute(query).fetchall()]
+        return [self._row_to_user(result) for result in self.conn.execute(query).fetchall()]
 
 
 
     def inactivate_user(self, user_id):
         query = "UPDATE users SET active = 0 WHERE id = ?"
         self.conn.execute(query, (user_id,))
-        self.conn.commit()
+        self._commit()
+        self._invalidate_user(user_id)
 
     def activate_user(self, user_id):
         query = "UPDATE users SET active = 1 WHERE id = ?"
         self.conn.execute(query, (user_id,))
-        self.conn.commit()
+        self._commit()
+        self._invalidate_user(user_id)
 
     def get_project(self, project_id):
+        project = self.identity_map.get(("project", project_id))
+        if project:
+            return project
         query = "SELECT * FROM projects WHERE id=?"
         result = self.conn.execute(query, (project_id,)).fetchone()
         if result:
             project = Project(result[0], result[2], result[1])
-            return project
+            return self.identity_map.put(("project", project_id), project)
         else:
             return None
         
@@ -267,28 +1081,70 @@ class Database:
 
 
     def get_user_by_id(self, user_id):
+        user = self.identity_map.get(("user", user_id))
+        if user:
+            return user
         query = "SELECT * FROM users WHERE id=?"
         result = self.conn.execute(query, (user_id,)).fetchone()
         if result:
-            return User(result[0], result[1], result[2], result[3], result[5], result[4])
+            return self._cache_user(result)
         else:
             return None
+
+    def get_users_by_ids(self, user_ids):
+        users = {}
+        missing_ids = []
+        for user_id in set(user_ids):
+            user = self.identity_map.get(("user", user_id))
+            if user:
+                users[user_id] = user
+            else:
+                missing_ids.append(user_id)
+
+        user_ids = missing_ids
+        for start in range(0, len(user_ids), MAX_QUERY_PARAMETERS):
+            chunk = user_ids[start:start + MAX_QUERY_PARAMETERS]
+            query = f"SELECT * FROM users WHERE id IN ({', '.join('?' * len(chunk))})"
+            for result in self.conn.execute(query, chunk).fetchall():
+                users[result[0]] = self._cache_user(result)
+        return users
     
     def get_project_members(self, project_id):
        query = "SELECT user_id FROM project_members WHERE project_id=?"
        member_ids = [member_id for member_id, in self.conn.execute(query, (project_id,)).fetchall()]
 
-       members = []
-       for member_id in member_ids:
-          user = self.get_user_by_id(member_id)
-          members.append(user)
-
-       return members
+       users = self.get_users_by_ids(member_ids)
+       return [users.get(member_id) for member_id in member_ids]
     
-    def get_current_user_id(self, page):
+    def load_principal(self, username):
+        result = self.conn.execute("SELECT id, username, isadmin, active FROM users WHERE username=?", (username,)).fetchone()
+        if result is None:
+            return None
+        user_id = result[0]
+        # Read the epoch before the memberships so a concurrent change forces a reload rather than being missed
+        epoch = self._principal_epochs.get(user_id, 0)
+        query = """
+            SELECT id, 1 FROM projects WHERE leader_id = ?
+            UNION ALL
+            SELECT project_id, 0 FROM project_members WHERE user_id = ?
+        """
+        led_project_ids, member_project_ids = [], []
+        for project_id, is_leader in self.conn.execute(query, (user_id, user_id)):
+            (led_project_ids if is_leader else member_project_ids).append(project_id)
+        return Principal(user_id, result[1], bool(result[2]), bool(result[3]), led_project_ids, member_project_ids, epoch)
+
+    def get_principal(self, page):
         username = page.session.get("username")
-        user = self.get_user_by_username(username)
-        return user.get_id()
+        if username is None:
+            return None
+        principal = page.session.get("principal")
+        if principal is None or principal.get_username() != username or principal.get_epoch() != self._principal_epochs.get(principal.get_user_id(), 0):
+            principal = self.load_principal(username)
+            page.session.set("principal", principal)
+        return principal
+
+    def get_current_user_id(self, page):
+        return self.get_principal(page).get_user_id()
     
     def get_current_user_username(self, page):
         username = page.session.get("username")
@@ -303,12 +1159,40 @@ class Database:
     def add_project_member(self, project_id, member_id):
         query = "INSERT INTO project_members (project_id, user_id) VALUES (?, ?) "
         self.conn.execute(query, (project_id, member_id))
-        self.conn.commit()
+        self._commit()
+        self._invalidate_user(member_id)
     
     def remove_project_member(self, project_id, member_id):
         query = "DELETE FROM project_members WHERE project_id=? AND user_id=?"
         self.conn.execute(query, (project_id, member_id))
-        self.conn.commit()
+        self._commit()
+        self._invalidate_user(member_id)
+
+    def remove_project_members(self, project_id, user_ids, author):
+        # Unassigns the members from the project's tasks and logs history only where an assignment existed
+        self.flush_journal()
+        with self.transaction():
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS removed_members (user_id INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM temp.removed_members")
+            self.conn.executemany("INSERT OR IGNORE INTO temp.removed_members (user_id) VALUES (?)", [(user_id,) for user_id in user_ids])
+            unassigned = self.conn.execute("""
+                INSERT INTO task_history (task_id, action, timestamp, author)
+                SELECT a.task_id, 'Unassigned user ' || u.username || ' due to removal from project', ?, ?
+                FROM temp.removed_members r
+                JOIN task_assignees a ON a.user_id = r.user_id
+                JOIN tasks t ON t.id = a.task_id
+                JOIN users u ON u.id = a.user_id
+                WHERE t.project_id = ?
+            """, (encode_timestamp(datetime.now()), author, project_id)).rowcount
+            self.conn.execute("""
+                DELETE FROM task_assignees
+                WHERE user_id IN (SELECT user_id FROM temp.removed_members)
+                AND task_id IN (SELECT id FROM tasks WHERE project_id = ?)
+            """, (project_id,))
+            self.conn.execute("DELETE FROM project_members WHERE project_id = ? AND user_id IN (SELECT user_id FROM temp.removed_members)", (project_id,))
+            for user_id in user_ids:
+                self._invalidate_user(user_id)
+        return unassigned
 
     def get_task_assignees(self, task_id):
         query = "SELECT user_id FROM task_assignees WHERE task_id=?"
@@ -316,49 +1200,146 @@ class Database:
         return assignee_ids
 
 
+    def _row_to_task(self, row, assignees):
+        return Task(task_id=row[0], project_id=row[1], title=row[2], description=row[3], priority=Priority(row[6]), status=Status(row[7]), assignees=assignees, start_datetime=decode_timestamp(row[4]), end_datetime=decode_timestamp(row[5]))
+
     def get_project_tasks(self, project_id):
         query = "SELECT * FROM tasks WHERE project_id = ?"
         result = self.conn.execute(query, (project_id,)).fetchall()
 
-        tasks = []
-        for row in result:
-            task_id = row[0]
-            project_id = row[1]
-            title = row[2]
-            description = row[3]
-            start_datetime = datetime.strptime(row[4], '%Y-%m-%d %H:%M:%S.%f')
-            end_datetime = datetime.strptime(row[5], '%Y-%m-%d %H:%M:%S.%f')
-            priority = Priority(row[6])
-            status = Status(row[7])
-            assignees = self.get_task_assignees(task_id)
-            task = Task(task_id=task_id, project_id=project_id, title=title, description=description, priority=priority, status=status, assignees=assignees, start_datetime=start_datetime, end_datetime=end_datetime)
-            tasks.append(task)
-
-        return tasks
+        # Load the assignees of every task in one pass instead of one query per task
+        query = "SELECT task_id, user_id FROM task_assignees WHERE task_id IN (SELECT id FROM tasks WHERE project_id = ?)"
+        assignees_by_task = {}
+        for task_id, user_id in self.conn.execute(query, (project_id,)):
+            assignees_by_task.setdefault(task_id, []).append(user_id)
+
+        return [self._row_to_task(row, assignees_by_task.get(row[0], [])) for row in result]
+
+    def get_project_board(self, project_id):
+        # Rows arrive in idx_tasks_board order, so grouping needs no sort in SQL or Python
+        query = """
+            SELECT t.id, t.project_id, t.title, t.description, t.start_datetime, t.end_datetime, t.priority, t.status,
+                   (SELECT group_concat(user_id) FROM task_assignees WHERE task_id = t.id)
+            FROM tasks t
+            WHERE t.project_id = ?
+            ORDER BY t.status, t.priority_rank
+        """
+        board = {status: [] for status in Status}
+        for status, rows in groupby(self.conn.execute(query, (project_id,)), key=itemgetter(7)):
+            board[Status(status)] = [self._row_to_task(row, [int(assignee) for assignee in row[8].split(",")] if row[8] else []) for row in rows]
+        return board
     
+    def get_project_counters(self, project_id):
+        counters = {
+            "total": 0,
+            "status": {status: 0 for status in Status},
+            "priority": {priority: 0 for priority in Priority},
+        }
+        query = "SELECT status, priority, count FROM project_task_counts WHERE project_id = ?"
+        for status, priority, count in self.conn.execute(query, (project_id,)):
+            counters["total"] += count
+            counters["status"][Status(status)] += count
+            counters["priority"][Priority(priority)] += count
+        return counters
+
+    def get_tasks_assigned_to(self, user_id, statuses=None, order="due"):
+        if order not in TASK_ORDERS:
+            raise ValueError(f"Unknown task order '{order}', expected one of {sorted(TASK_ORDERS)}")
+        params = [user_id]
+        status_filter = ""
+        if statuses is not None:
+            statuses = [status.value if isinstance(status, Status) else status for status in statuses]
+            if not statuses:
+                return []
+            status_filter = f"AND t.status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        # Assignees of each task come back in the same statement as a comma separated list
+        query = f"""
+            SELECT t.id, t.project_id, t.title, t.description, t.start_datetime, t.end_datetime, t.priority, t.status,
+                   (SELECT group_concat(user_id) FROM task_assignees WHERE task_id = t.id)
+            FROM task_assignees a
+            JOIN tasks t ON t.id = a.task_id
+            WHERE a.user_id = ? {status_filter}
+            ORDER BY {TASK_ORDERS[order]}
+        """
+        return [self._row_to_task(row, [int(assignee) for assignee in row[8].split(",")]) for row in self.conn.execute(query, params)]
+
     def get_task(self, task_id):
         query = "SELECT * FROM tasks WHERE id=?"
         result = self.conn.execute(query, (task_id,)).fetchone()
 
         if result:
-            project_id = result[1]
-            title = result[2]
-            description = result[3]
-            start_datetime = datetime.strptime(result[4],'%Y-%m-%d %H:%M:%S.%f')
-            end_datetime = datetime.strptime(result[5], '%Y-%m-%d %H:%M:%S.%f')
-            priority = Priority(result[6])
-            status = Status(result[7])
-            assignees = self.get_task_assignees(task_id)
-
-            task = Task(task_id=task_id, project_id=project_id, title=title, description=description, priority=priority, status=status, assignees=assignees, start_datetime=start_datetime, end_datetime=end_datetime)
-            return task
+            return self._row_to_task(result, self.get_task_assignees(task_id))
         else:
+            return self.get_archived_task(task_id)
+
+    def get_archived_task(self, task_id):
+        result = self.conn.execute("SELECT * FROM archive.tasks WHERE id=?", (task_id,)).fetchone()
+        if result is None:
             return None
+        assignees = [row[0] for row in self.conn.execute("SELECT user_id FROM archive.task_assignees WHERE task_id=?", (task_id,))]
+        task = self._row_to_task(result, assignees)
+        # Archived tasks are read whole, the paged comment and history getters only cover live tasks
+        query = "SELECT username, content, timestamp FROM archive.comments WHERE task_id = ? ORDER BY timestamp ASC, id ASC"
+        task.comments = [Comment(username=row[0], content=row[1], timestamp=decode_timestamp(row[2])) for row in self.conn.execute(query, (task_id,))]
+        query = "SELECT action, author, timestamp FROM archive.task_history WHERE task_id = ? ORDER BY timestamp ASC, id ASC"
+        task.history = [History(author=row[1], action=row[0], timestamp=decode_timestamp(row[2])) for row in self.conn.execute(query, (task_id,))]
+        return task
+
+    def get_archived_project_tasks(self, project_id):
+        # Tasks still in main are mid-archive and listed with the live ones
+        query = "SELECT * FROM archive.tasks WHERE project_id = ? AND id NOT IN (SELECT id FROM main.tasks) ORDER BY end_datetime DESC"
+        result = self.conn.execute(query, (project_id,)).fetchall()
+
+        query = "SELECT task_id, user_id FROM archive.task_assignees WHERE task_id IN (SELECT id FROM archive.tasks WHERE project_id = ?)"
+        assignees_by_task = {}
+        for task_id, user_id in self.conn.execute(query, (project_id,)):
+            assignees_by_task.setdefault(task_id, []).append(user_id)
+
+        return [self._row_to_task(row, assignees_by_task.get(row[0], [])) for row in result]
+
+    def is_archived(self, task_id):
+        # True once archive_tasks has moved the task out of main
+        query = "SELECT 1 FROM archive.tasks WHERE id = ? AND NOT EXISTS (SELECT 1 FROM main.tasks WHERE id = ?)"
+        return self.conn.execute(query, (task_id, task_id)).fetchone() is not None
+
+    def archive_tasks(self, older_than, batch_size=ARCHIVE_BATCH_SIZE):
+        # Moves ARCHIVED tasks that ended before older_than, with their dependents, one batch at a time.
+        # main uses WAL and the archive does not, so one transaction over both is not atomic: each batch
+        # is copied and committed first, and only tasks whose copy is complete are deleted afterwards.
+        self.flush_journal()
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id TEXT PRIMARY KEY)")
+        moved = 0
+        while True:
+            with self.transaction():
+                self.conn.execute("DELETE FROM temp.archive_batch")
+                query = "INSERT INTO temp.archive_batch SELECT id FROM tasks WHERE status = 'ARCHIVED' AND end_datetime < ? LIMIT ?"
+                count = self.conn.execute(query, (encode_timestamp(older_than), batch_size)).rowcount
+                for table, task_column, columns, archive_columns, _ in ARCHIVED_TABLES:
+                    self.conn.execute(f"INSERT OR IGNORE INTO archive.{table} ({archive_columns}) SELECT {columns} FROM main.{table} WHERE {task_column} IN (SELECT id FROM temp.archive_batch)")
+
+            self.conn.execute("BEGIN IMMEDIATE")
+            with self.transaction():
+                # Tasks edited since the copy, or with rows that never reached the archive, stay in main
+                incomplete = set()
+                for table, task_column, _, _, match in ARCHIVED_TABLES:
+                    query = f"""
+                        SELECT DISTINCT m.{task_column} FROM main.{table} m
+                        WHERE m.{task_column} IN (SELECT id FROM temp.archive_batch)
+                        AND NOT EXISTS (SELECT 1 FROM archive.{table} a WHERE {match})
+                    """
+                    incomplete.update(row[0] for row in self.conn.execute(query))
+                if incomplete:
+                    logger.warning(f"Not archiving {len(incomplete)} tasks whose archive copy is incomplete")
+                    self.conn.executemany("DELETE FROM temp.archive_batch WHERE id = ?", [(task_id,) for task_id in incomplete])
+                    for table, task_column, _, _, _ in ARCHIVED_TABLES:
+                        self.conn.executemany(f"DELETE FROM archive.{table} WHERE {task_column} = ?", [(task_id,) for task_id in incomplete])
+                for table, task_column, _, _, _ in ARCHIVED_TABLES:
+                    self.conn.execute(f"DELETE FROM main.{table} WHERE {task_column} IN (SELECT id FROM temp.archive_batch)")
+            moved += count - len(incomplete)
+            if count < batch_size or len(incomplete) == count:
+                return moved
         
-    def get_current_user(self, page):
-        username = page.session.get("username")
-        return self.get_user_by_username(username)
-    
     def get_user_project_member(self, user_id):
         query = "SELECT project_id FROM project_members WHERE user_id = ?"
         project_ids = [result[0] for result in self.conn.execute(query, (user_id,)).fetchall()]
@@ -366,6 +1347,14 @@ class Database:
         return projects
     
 
+    def get_user_projects(self, user_id):
+        query = """
+            SELECT * FROM projects WHERE leader_id = ?
+            UNION
+            SELECT p.* FROM project_members m JOIN projects p ON p.id = m.project_id WHERE m.user_id = ?
+        """
+        return [Project(result[0], result[2], result[1]) for result in self.conn.execute(query, (user_id, user_id)).fetchall()]
+
     def get_user_project_leader(self, user_id):
         query = "SELECT * FROM projects WHERE leader_id = ?"
         results = self.conn.execute(query, (user_id,)).fetchall()
@@ -375,24 +1364,70 @@ class Database:
     def add_assignee(self, task_id, user_id):
         query = "INSERT INTO task_assignees (task_id, user_id) VALUES (?, ?)"
         self.conn.execute(query, (task_id, user_id))
-        self.conn.commit()
+        self._commit()
 
     def remove_assignee(self, task_id, user_id):
         query = "DELETE FROM task_assignees WHERE task_id=? AND user_id=?"
         self.conn.execute(query, (task_id, user_id))
-        self.conn.commit()
+        self._commit()
 
     def change_status(self, task_id, new_status):
         query = "UPDATE tasks SET status=? WHERE id=?"
         self.conn.execute(query, (new_status, task_id))
-        self.conn.commit()
+        self._commit()
 
     def change_priority(self, task_id, new_priority):
         query = "UPDATE tasks SET priority = ? WHERE id = ?"
         self.conn.execute(query, (new_priority.value, task_id))
-        self.conn.commit()
+        self._commit()
+
+    def _get_task_values(self, task_ids, column):
+        values = {}
+        task_ids = list(dict.fromkeys(task_ids))
+        for start in range(0, len(task_ids), MAX_QUERY_PARAMETERS):
+            chunk = task_ids[start:start + MAX_QUERY_PARAMETERS]
+            query = f"SELECT id, {column} FROM tasks WHERE id IN ({', '.join('?' * len(chunk))})"
+            values.update(self.conn.execute(query, chunk).fetchall())
+        return values
+
+    def _add_task_history_rows(self, rows):
+        # Written in the caller's transaction rather than through the write-behind journal
+        timestamp = encode_timestamp(datetime.now())
+        query = "INSERT INTO task_history (task_id, action, timestamp, author) VALUES (?, ?, ?, ?)"
+        self.conn.executemany(query, [(task_id, action, timestamp, author) for task_id, action, author in rows])
+
+    def _bulk_change(self, task_ids, column, new_value, author):
+        self.flush_journal()
+        with self.transaction():
+            changed = [(task_id, old_value) for task_id, old_value in self._get_task_values(task_ids, column).items() if old_value != new_value]
+            self.conn.executemany(f"UPDATE tasks SET {column} = ? WHERE id = ?", [(new_value, task_id) for task_id, _ in changed])
+            self._add_task_history_rows([(task_id, f"Changed {column} from {old_value} to {new_value}", author) for task_id, old_value in changed])
+        return len(changed)
+
+    def bulk_change_status(self, task_ids, new_status, author):
+        return self._bulk_change(task_ids, "status", Status(new_status).value, author)
+
+    def bulk_change_priority(self, task_ids, new_priority, author):
+        return self._bulk_change(task_ids, "priority", Priority(new_priority).value, author)
+
+    def bulk_assign(self, task_ids, user_ids, author):
+        # Only assignments that did not exist yet are inserted and logged
+        self.flush_journal()
+        task_ids = list(self._get_task_values(task_ids, "id"))
+        users = self.get_users_by_ids(user_ids)
+        with self.transaction():
+            existing = set()
+            for start in range(0, len(task_ids), MAX_QUERY_PARAMETERS):
+                chunk = task_ids[start:start + MAX_QUERY_PARAMETERS]
+                query = f"SELECT task_id, user_id FROM task_assignees WHERE task_id IN ({', '.join('?' * len(chunk))})"
+                existing.update(self.conn.execute(query, chunk).fetchall())
+            added = [(task_id, user_id) for task_id in task_ids for user_id in users if (task_id, user_id) not in existing]
+            self.conn.executemany("INSERT INTO task_assignees (task_id, user_id) VALUES (?, ?)", added)
+            self._add_task_history_rows([(task_id, f"Assigned user {users[user_id].get_username()}", author) for task_id, user_id in added])
+        return len(added)
 
     def purge_data(self):
+        self.flush_journal()
         cursor = self.conn.cursor()
         cursor.execute("DELETE FROM users")
         cursor.execute("DELETE FROM projects")
@@ -401,20 +1436,25 @@ class Database:
         cursor.execute("DELETE FROM task_assignees")
         cursor.execute("DELETE FROM comments")
         cursor.execute("DELETE FROM task_history")
-        self.conn.commit()
+        for table, _, _, _, _ in ARCHIVED_TABLES:
+            cursor.execute(f"DELETE FROM archive.{table}")
+        self._commit()
         cursor.close()
+        self.identity_map.clear()
 
     def delete_comment(self, task_id, username, content,timestamp):
+        self.flush_journal()
         self.conn.execute("DELETE FROM comments WHERE task_id = ? AND username = ? AND content = ? And timestamp = ?",
-                          (task_id, username, content,timestamp))
-        self.conn.commit()
+                          (task_id, username, content, encode_timestamp(timestamp)))
+        self._commit()
 
     def get_comment(self, task_id, username, content,timestamp):
+        self.flush_journal()
         cursor = self.conn.execute("SELECT username, content, timestamp FROM comments WHERE task_id = ? AND username = ? AND content = ? And timestamp = ?",
-                                   (task_id, username, content,timestamp,))
+                                   (task_id, username, content, encode_timestamp(timestamp),))
         row = cursor.fetchone()
         if row:
-           return Comment(username=row[0], content=row[1], timestamp=row[2]) 
+           return Comment(username=row[0], content=row[1], timestamp=decode_timestamp(row[2])) 
         return None
 
 
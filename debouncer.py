@@ -0,0 +1,47 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Debouncer:
+    """Runs delayed calls on one long-lived daemon thread, so their database work reuses its connection.
+
+    Scheduling a key that is still pending replaces the earlier call and restarts its delay.
+    """
+
+    def __init__(self, name="debouncer"):
+        self.name = name
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, key, delay, function, *args):
+        with self._condition:
+            self._pending[key] = (time.monotonic() + delay, function, args)
+            if self._thread is None:
+                # Started on first use so importing the module never spawns a thread
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def cancel(self, key):
+        with self._condition:
+            self._pending.pop(key, None)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                key, (deadline, function, args) = min(self._pending.items(), key=lambda item: item[1][0])
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                del self._pending[key]
+            try:
+                function(*args)
+            except Exception:
+                logger.exception(f"Debounced call on '{self.name}' failed")
@@ -0,0 +1,113 @@
+import gzip
+from itertools import groupby
+from operator import itemgetter
+
+import orjson
+
+from comment import Comment
+from database import decode_timestamp
+from history import History
+from project import Project
+
+EXPORT_FORMATS = ("jsonl", "json")
+
+
+class _Children:
+    """Walks a cursor sorted by its first column alongside a parent cursor sorted the same way."""
+
+    def __init__(self, rows):
+        self._groups = groupby(rows, key=itemgetter(0))
+        self._current = next(self._groups, None)
+
+    def take(self, key):
+        while self._current is not None and self._current[0] < key:
+            self._current = next(self._groups, None)
+        if self._current is None or self._current[0] != key:
+            return []
+        rows = list(self._current[1])
+        self._current = next(self._groups, None)
+        return rows
+
+
+def iter_export_records(db, project_id=None):
+    """Yield users, projects and tasks (with comments and history) as plain dicts.
+
+    Every table is read through its own cursor ordered by the parent key and merged
+    in Python, so memory stays bounded by the largest single task. Live tasks come
+    first, followed by the tasks moved to the archive database.
+    """
+    conn = db.conn
+    params = {"project_id": project_id}
+    if project_id is None:
+        user_filter = project_filter = member_filter = membership_filter = task_filter = task_join = ""
+    else:
+        user_filter = "WHERE id IN (SELECT leader_id FROM projects WHERE id = :project_id UNION SELECT user_id FROM project_members WHERE project_id = :project_id)"
+        project_filter = "WHERE id = :project_id"
+        member_filter = "WHERE project_id = :project_id"
+        membership_filter = "WHERE m.project_id = :project_id"
+        task_filter = "WHERE project_id = :project_id"
+        task_join = "JOIN {schema}.tasks t ON t.id = x.task_id WHERE t.project_id = :project_id"
+
+    memberships = _Children(conn.execute(f"""
+        SELECT user_id, id, project_name, leader_id FROM (
+            SELECT leader_id AS user_id, id, project_name, leader_id FROM projects {project_filter}
+            UNION
+            SELECT m.user_id, p.id, p.project_name, p.leader_id FROM project_members m JOIN projects p ON p.id = m.project_id
+            {membership_filter}
+        )
+        ORDER BY user_id, id
+    """, params))
+    for row in conn.execute(f"SELECT * FROM users {user_filter} ORDER BY id", params):
+        user = db._row_to_user(row)
+        user.projects = [Project(project_id, name, leader_id) for _, project_id, name, leader_id in memberships.take(row[0])]
+        yield {"type": "user", **user.to_dict()}
+
+    members = _Children(conn.execute(f"SELECT project_id, user_id FROM project_members {member_filter} ORDER BY project_id, user_id", params))
+    for key, project_name, leader_id in conn.execute(f"SELECT id, project_name, leader_id FROM projects {project_filter} ORDER BY id", params):
+        yield {
+            "type": "project",
+            "project_id": key,
+            "project_name": project_name,
+            "leader_id": leader_id,
+            "members": [user_id for _, user_id in members.take(key)],
+        }
+
+    for schema in ("main", "archive"):
+        join = task_join.format(schema=schema)
+        assignees = _Children(conn.execute(f"SELECT x.task_id, x.user_id FROM {schema}.task_assignees x {join} ORDER BY x.task_id, x.user_id", params))
+        comments = _Children(conn.execute(f"SELECT x.task_id, x.username, x.content, x.timestamp FROM {schema}.comments x {join} ORDER BY x.task_id, x.timestamp, x.id", params))
+        history = _Children(conn.execute(f"SELECT x.task_id, x.action, x.author, x.timestamp FROM {schema}.task_history x {join} ORDER BY x.task_id, x.timestamp, x.id", params))
+        where = task_filter
+        if schema == "archive":
+            # Archiving copies before it deletes, so a task caught in between is still exported as live
+            where = f"{where} AND" if where else "WHERE"
+            where += " id NOT IN (SELECT id FROM main.tasks)"
+        query = f"SELECT id, project_id, title, description, start_datetime, end_datetime, priority, status FROM {schema}.tasks {where} ORDER BY id"
+        for row in conn.execute(query, params):
+            task = db._row_to_task(row, [user_id for _, user_id in assignees.take(row[0])])
+            task.comments = [Comment(username, content, decode_timestamp(timestamp)) for _, username, content, timestamp in comments.take(row[0])]
+            task.history = [History(action, author, decode_timestamp(timestamp)) for _, action, author, timestamp in history.take(row[0])]
+            yield {"type": "task", **task.to_dict(), "archived": schema == "archive"}
+
+
+def export(db, path, project_id=None, fmt="jsonl", compress=False):
+    """Write the export to path as JSON Lines or a single JSON array and return the record count."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+    db.flush_journal()
+    count = 0
+    with (gzip.open(path, "wb") if compress else open(path, "wb")) as file:
+        # One read transaction gives every cursor the same snapshot
+        with db.transaction():
+            if fmt == "json":
+                file.write(b"[")
+            for record in iter_export_records(db, project_id):
+                if fmt == "json":
+                    file.write(b",\n" if count else b"\n")
+                    file.write(orjson.dumps(record))
+                else:
+                    file.write(orjson.dumps(record) + b"\n")
+                count += 1
+            if fmt == "json":
+                file.write(b"\n]\n")
+    return count
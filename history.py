@@ -31,4 +31,12 @@ class History:
 
     
     def set_timestamp(self, timestamp):
-        self.timestamp = timestamp
\ No newline at end of file
+        self.timestamp = timestamp
+
+
+    def to_dict(self):
+        return {
+            "action": self.action,
+            "author": self.author,
+            "timestamp": self.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        }
\ No newline at end of file
@@ -0,0 +1,220 @@
+import csv
+import json
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
+from task import Priority, Status
+from database import encode_timestamp
+
+# Rows written per transaction
+IMPORT_BATCH_SIZE = 5000
+
+# Row errors kept for the report; later ones are only counted so memory stays bounded
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_KINDS = ("users", "projects", "tasks")
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, kind):
+        self.kind = kind
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, message))
+
+    def __repr__(self):
+        return f"ImportReport(kind='{self.kind}', imported={self.imported}, failed={self.failed})"
+
+
+def read_records(path, fmt=None):
+    """Yield (line_number, record) pairs from a CSV or JSONL file without loading it whole."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record
+        elif fmt == "jsonl":
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as error:
+                    yield line_number, RowError(f"invalid JSON: {error}")
+        else:
+            raise ValueError(f"Unknown import format '{fmt}', expected 'csv' or 'jsonl'")
+
+
+def _required(record, field):
+    value = record.get(field)
+    if value is None or str(value).strip() == "":
+        raise RowError(f"missing required field '{field}'")
+    return value
+
+
+def _list(value):
+    # CSV cells hold ';'-separated lists, JSONL records may use real arrays
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value).split(";") if item.strip()]
+
+
+def _flag(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def _enum(enum, value, default):
+    if value is None or value == "":
+        return default.value
+    try:
+        return enum[str(value).strip().upper()].value
+    except KeyError:
+        raise RowError(f"invalid {enum.__name__.lower()} '{value}', expected one of {', '.join(enum.__members__)}")
+
+
+def _datetime(record, field, default):
+    value = record.get(field)
+    if value is None or value == "":
+        return default
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise RowError(f"invalid {field} '{value}', expected an ISO 8601 date")
+    if parsed.tzinfo is not None:
+        # Timestamps are stored as naive local time
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+class BulkImporter:
+    """Validates streamed records and writes them with executemany, one transaction per batch.
+
+    A batch that violates a constraint is replayed row by row so only the offending
+    rows are reported and the rest of the batch still lands.
+    """
+
+    def __init__(self, db, batch_size=IMPORT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self._user_ids = {}
+        self._project_ids = set()
+
+    def run(self, kind, records):
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Unknown import kind '{kind}', expected one of {', '.join(IMPORT_KINDS)}")
+        convert = getattr(self, f"_convert_{kind}")
+        report = ImportReport(kind)
+        batch = []
+        for line_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                batch.append((line_number, convert(record)))
+            except RowError as error:
+                report.add_error(line_number, str(error))
+                continue
+            if len(batch) >= self.batch_size:
+                self._write(kind, batch, report)
+                batch = []
+        if batch:
+            self._write(kind, batch, report)
+        return report
+
+    def _user_id(self, username):
+        if username not in self._user_ids:
+            result = self.db.conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+            if result is None:
+                raise RowError(f"unknown user '{username}'")
+            self._user_ids[username] = result[0]
+        return self._user_ids[username]
+
+    def _check_project(self, project_id):
+        if project_id not in self._project_ids:
+            if self.db.conn.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone() is None:
+                raise RowError(f"unknown project '{project_id}'")
+            self._project_ids.add(project_id)
+
+    def _convert_users(self, record):
+        username = str(_required(record, "username")).strip()
+        email = str(_required(record, "email")).strip()
+        password_hash = record.get("password_hash")
+        if password_hash and not self.db.password_hasher.is_valid(str(password_hash)):
+            raise RowError("invalid password_hash, expected a pbkdf2_sha256 or legacy SHA-256 hash")
+        password = None if password_hash else str(_required(record, "password"))
+        return [username, password_hash, password, email, _flag(record.get("active"), True), _flag(record.get("is_admin"), False)]
+
+    def _convert_projects(self, record):
+        project_id = str(_required(record, "id")).strip()
+        name = str(_required(record, "project_name")).strip()
+        leader_id = self._user_id(str(_required(record, "leader")).strip())
+        member_ids = sorted({self._user_id(username) for username in _list(record.get("members"))})
+        return [(project_id, leader_id, name), [(project_id, member_id) for member_id in member_ids]]
+
+    def _convert_tasks(self, record):
+        task_id = str(record.get("id") or uuid.uuid4())
+        project_id = str(_required(record, "project_id")).strip()
+        self._check_project(project_id)
+        title = str(_required(record, "title")).strip()
+        start_datetime = _datetime(record, "start_datetime", datetime.now())
+        end_datetime = _datetime(record, "end_datetime", start_datetime + timedelta(hours=24))
+        if end_datetime < start_datetime:
+            raise RowError("end_datetime is before start_datetime")
+        priority = _enum(Priority, record.get("priority"), Priority.LOW)
+        status = _enum(Status, record.get("status"), Status.BACKLOG)
+        assignee_ids = sorted({self._user_id(username) for username in _list(record.get("assignees"))})
+        task_row = (task_id, project_id, title, record.get("description") or "", encode_timestamp(start_datetime), encode_timestamp(end_datetime), priority, status)
+        return [task_row, [(task_id, user_id) for user_id in assignee_ids]]
+
+    def _write(self, kind, batch, report):
+        if kind == "users":
+            # Hash the whole batch at once so the process pool works on it in parallel
+            plain = [row for _, row in batch if row[1] is None]
+            for row, password_hash in zip(plain, self.db.password_hasher.hash_many([row[2] for row in plain])):
+                row[1] = password_hash
+        try:
+            with self.db.transaction():
+                self._insert(kind, [rows for _, rows in batch])
+            report.imported += len(batch)
+        except sqlite3.IntegrityError:
+            for line_number, rows in batch:
+                try:
+                    with self.db.transaction():
+                        self._insert(kind, [rows])
+                    report.imported += 1
+                except sqlite3.IntegrityError as error:
+                    report.add_error(line_number, str(error))
+
+    def _insert(self, kind, rows):
+        conn = self.db.conn
+        if kind == "users":
+            conn.executemany(
+                "INSERT INTO users (username, password, email, active, isadmin) VALUES (?, ?, ?, ?, ?)",
+                [(username, password_hash, email, active, is_admin) for username, password_hash, _, email, active, is_admin in rows])
+        elif kind == "projects":
+            conn.executemany("INSERT INTO projects (id, leader_id, project_name) VALUES (?, ?, ?)", [project for project, _ in rows])
+            conn.executemany("INSERT INTO project_members (project_id, user_id) VALUES (?, ?)", [member for _, members in rows for member in members])
+            for (_, leader_id, _), members in rows:
+                for user_id in [leader_id, *(user_id for _, user_id in members)]:
+                    self.db._invalidate_user(user_id)
+        else:
+            conn.executemany(
+                "INSERT INTO tasks (id, project_id, title, description, start_datetime, end_datetime, priority, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [task for task, _ in rows])
+            conn.executemany("INSERT INTO task_assignees (task_id, user_id) VALUES (?, ?)", [assignee for _, assignees in rows for assignee in assignees])
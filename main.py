@@ -4,6 +4,7 @@ import logging
 import re
 import sqlite3
 import sys
+import threading
 import uuid
 from datetime import date, datetime, timedelta
 
@@ -14,10 +15,18 @@ from project import Project
 from task import *
 from user import User
 
-from database import Database
+from database import PAGE_SIZE, Database
+from backup import BackupScheduler
+from debouncer import Debouncer
 
 DB_FILE = 'database.db'
 
+# Seconds of typing pause before a user picker queries the database
+USER_PICKER_DEBOUNCE = 0.3
+
+# Every user picker searches on this one thread, so type-ahead queries share a single connection
+user_search_debouncer = Debouncer("user-picker")
+
 
 logging.basicConfig(
     level=logging.INFO,
@@ -135,10 +144,7 @@ class LoginPage(UserControl):
         self.update()
 
     def check_credentials(self, username, password):
-        hashed_password = self.db._hash_password(password)
-        query = "SELECT * FROM users WHERE username=? AND password=?"
-        result = self.db.conn.execute(query, (username, hashed_password)).fetchone()
-        return result is not None
+        return self.db.verify_credentials(username, password) is not None
 
     def check_active(self, username):
         query = "SELECT active FROM users WHERE username=?"
@@ -318,6 +324,28 @@ class MainPage(UserControl):
                     padding=Padding(15, 10, 15, 10)
                 )
             ),
+            ElevatedButton(
+                text="My Tasks",
+                on_click=self.show_my_tasks,
+                width=300,
+                style=ButtonStyle(
+                    bgcolor=self.page.theme.color_scheme.secondary,
+                    color={"": colors.WHITE},
+                    shape=RoundedRectangleBorder(radius=10),
+                    padding=Padding(15, 10, 15, 10)
+                )
+            ),
+            ElevatedButton(
+                text="Search",
+                on_click=self.search,
+                width=300,
+                style=ButtonStyle(
+                    bgcolor=self.page.theme.color_scheme.secondary,
+                    color={"": colors.WHITE},
+                    shape=RoundedRectangleBorder(radius=10),
+                    padding=Padding(15, 10, 15, 10)
+                )
+            ),
             ElevatedButton(
                 text="Log out",
                 on_click=self.go_back,
@@ -331,7 +359,7 @@ class MainPage(UserControl):
             )
         ]
 
-        if self.db.is_admin(self.username):
+        if self.db.get_principal(self.page).get_is_admin():
             buttons.append(
                 ElevatedButton(
                     text="Manage Users",
@@ -374,6 +402,7 @@ class MainPage(UserControl):
         self.page.update()
     def go_back(self,e):
         logger.info(f"User '{self.username}' logged out successfully!")
+        self.page.session.clear()
         self.page.go("/")
 
     def show_projects(self, e):
@@ -385,14 +414,156 @@ class MainPage(UserControl):
     def manage_users(self, e):
         self.page.go("/manage_users")
 
-class ProjectListPage(UserControl):
+    def search(self, e):
+        self.page.go("/search")
+
+    def show_my_tasks(self, e):
+        self.page.go("/my_tasks")
+
+class MyTasksPage(UserControl):
+    def __init__(self, db, page):
+        super().__init__()
+        self.db = db
+        self.page = page
+        self.user_id = self.db.get_current_user_id(self.page)
+
+    def build(self):
+        self.order_dropdown = ft.Dropdown(
+            label="Sort by",
+            options=[ft.dropdown.Option("due"), ft.dropdown.Option("priority"), ft.dropdown.Option("start")],
+            value="due",
+            width=300,
+            on_change=self.refresh_tasks,
+        )
+        self.show_done_checkbox = Checkbox(label="Show done and archived", value=False, on_change=self.refresh_tasks)
+        self.tasks_column = Column(controls=self._build_task_controls(), spacing=10, horizontal_alignment=CrossAxisAlignment.CENTER)
+
+        return Container(
+            content=Column(
+                controls=[
+                    Text("My Tasks", size=30, weight=FontWeight.BOLD, color=self.page.theme.color_scheme.on_secondary),
+                    self.order_dropdown,
+                    self.show_done_checkbox,
+                    self.tasks_column,
+                    ElevatedButton(
+                        text="Back",
+                        on_click=lambda e: self.page.go("/main"),
+                        width=300,
+                        style=ButtonStyle(
+                            bgcolor={"": colors.BLUE_ACCENT_700},
+                            color={"": colors.WHITE},
+                            shape=RoundedRectangleBorder(radius=10),
+                            padding=Padding(15, 10, 15, 10)
+                        )
+                    )
+                ],
+                alignment=MainAxisAlignment.CENTER,
+                horizontal_alignment=CrossAxisAlignment.CENTER,
+                spacing=20
+            ),
+            alignment=ft.alignment.center,
+            padding=20
+        )
+
+    def _build_task_controls(self):
+        statuses = None if self.show_done_checkbox.value else [Status.BACKLOG, Status.TODO, Status.DOING]
+        tasks = self.db.get_tasks_assigned_to(self.user_id, statuses=statuses, order=self.order_dropdown.value)
+        controls = [
+            ElevatedButton(
+                text=f"{task.get_title()} [{task.get_status().name}, {task.get_priority().name}] due {task.get_end_datetime():%Y-%m-%d %H:%M}",
+                on_click=lambda e, task_id=task.get_task_id(): self.page.go(f"/show_task_details/{task_id}"),
+                width=300,
+                style=ButtonStyle(
+                    bgcolor=self.page.theme.color_scheme.primary,
+                    color={"": colors.WHITE},
+                    shape=RoundedRectangleBorder(radius=10),
+                    padding=Padding(15, 10, 15, 10)
+                )
+            )
+            for task in tasks
+        ]
+        return controls or [Text("No tasks assigned to you.", italic=True)]
+
+    def refresh_tasks(self, e):
+        self.tasks_column.controls = self._build_task_controls()
+        self.update()
+
+class SearchPage(UserControl):
     def __init__(self, db, page):
         super().__init__()
         self.db = db
         self.page = page
-        self.username = self.db.get_current_user(self.page).get_username()
         self.user_id = self.db.get_current_user_id(self.page)
 
+    def build(self):
+        self.query_field = TextField(label="Search tasks and comments", width=300, on_submit=self.run_search)
+        self.results_column = Column(spacing=10, horizontal_alignment=CrossAxisAlignment.CENTER)
+
+        return Container(
+            content=Column(
+                controls=[
+                    Text("Search", size=30, weight=FontWeight.BOLD, color=self.page.theme.color_scheme.on_secondary),
+                    self.query_field,
+                    ElevatedButton(
+                        text="Search",
+                        on_click=self.run_search,
+                        width=300,
+                        style=ButtonStyle(
+                            bgcolor=self.page.theme.color_scheme.primary,
+                            color={"": colors.WHITE},
+                            shape=RoundedRectangleBorder(radius=10),
+                            padding=Padding(15, 10, 15, 10)
+                        )
+                    ),
+                    self.results_column,
+                    ElevatedButton(
+                        text="Back",
+                        on_click=lambda e: self.page.go("/main"),
+                        width=300,
+                        style=ButtonStyle(
+                            bgcolor={"": colors.BLUE_ACCENT_700},
+                            color={"": colors.WHITE},
+                            shape=RoundedRectangleBorder(radius=10),
+                            padding=Padding(15, 10, 15, 10)
+                        )
+                    )
+                ],
+                alignment=MainAxisAlignment.CENTER,
+                horizontal_alignment=CrossAxisAlignment.CENTER,
+                spacing=20
+            ),
+            alignment=ft.alignment.center,
+            padding=20
+        )
+
+    def run_search(self, e):
+        hits = self.db.search(self.user_id, self.query_field.value or "")
+        self.results_column.controls = [
+            ElevatedButton(
+                text=f"{hit.get_title()} ({hit.get_kind()}): {hit.get_snippet()}",
+                on_click=lambda e, task_id=hit.get_task_id(): self.page.go(f"/show_task_details/{task_id}"),
+                width=300,
+                style=ButtonStyle(
+                    bgcolor=self.page.theme.color_scheme.primary,
+                    color={"": colors.WHITE},
+                    shape=RoundedRectangleBorder(radius=10),
+                    padding=Padding(15, 10, 15, 10)
+                )
+            )
+            for hit in hits
+        ] or [Text("No results found.", italic=True)]
+        self.update()
+        logger.info(f"User '{self.db.get_current_user_username(self.page)}' searched for '{self.query_field.value}' ({len(hits)} hits)")
+
+class ProjectListPage(UserControl):
+    def __init__(self, db, page):
+        super().__init__()
+        self.db = db
+        self.page = page
+        principal = self.db.get_principal(self.page)
+        self.username = principal.get_username()
+        self.user_id = principal.get_user_id()
+
     def build(self):
         button_width = 300  # Set a fixed width for all buttons
         leader_projects = self.db.get_user_project_leader(self.user_id)
@@ -671,6 +842,81 @@ class InactiveUsersPage(UserControl):
         self.update()
 
 
+class UserPicker(UserControl):
+    """Type-ahead user selector: only the top matches of search(prefix, limit, offset) become checkboxes."""
+
+    def __init__(self, search, page, label="Search by username or email", debounce=USER_PICKER_DEBOUNCE):
+        super().__init__()
+        self.search = search
+        self.page = page
+        self.label = label
+        self.debounce = debounce
+        self.selected = {}
+        self.prefix = None
+        self.offset = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def build(self):
+        self.query_field = TextField(label=self.label, width=300, on_change=self.schedule_search)
+        self.checkbox_column = Column(spacing=10)
+        self.load_more_button = ElevatedButton(
+            text="Load More Users",
+            on_click=self.load_more,
+            width=300,
+            style=ButtonStyle(
+                bgcolor=self.page.theme.color_scheme.secondary,
+                color={"": colors.WHITE},
+                shape=RoundedRectangleBorder(radius=10),
+                padding=Padding(15, 10, 15, 10)
+            )
+        )
+        self.checkbox_column.controls = self._build_checkboxes(self.search(None, PAGE_SIZE + 1, 0))
+        return Column([self.query_field, self.checkbox_column, self.load_more_button], horizontal_alignment=CrossAxisAlignment.CENTER)
+
+    def _checkbox(self, user_id, username, value):
+        return Checkbox(label=username, key=user_id, value=value, on_change=lambda e: self.toggle(user_id, username, e.control.value))
+
+    def _build_checkboxes(self, users):
+        self.load_more_button.visible = len(users) > PAGE_SIZE
+        users = users[:PAGE_SIZE]
+        self.offset += len(users)
+        return [self._checkbox(user.get_id(), user.get_username(), False) for user in users if user.get_id() not in self.selected]
+
+    def toggle(self, user_id, username, checked):
+        if checked:
+            self.selected[user_id] = username
+        else:
+            self.selected.pop(user_id, None)
+
+    def schedule_search(self, e):
+        # Wait for a pause in typing so each keystroke does not cost a query and a redraw
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        user_search_debouncer.schedule(self, self.debounce, self.run_search, self.query_field.value, generation)
+
+    def run_search(self, prefix, generation):
+        prefix = (prefix or "").strip() or None
+        users = self.search(prefix, PAGE_SIZE + 1, 0)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.prefix = prefix
+            self.offset = 0
+            # Checked users stay listed whatever the filter
+            checked = [self._checkbox(user_id, username, True) for user_id, username in self.selected.items()]
+            self.checkbox_column.controls = checked + self._build_checkboxes(users)
+        self.update()
+
+    def load_more(self, e):
+        self.checkbox_column.controls.extend(self._build_checkboxes(self.search(self.prefix, PAGE_SIZE + 1, self.offset)))
+        self.update()
+
+    def get_selected_ids(self):
+        return list(self.selected)
+
+
 class CreateProjectPage(UserControl):
     def __init__(self, db, username, page):
         super().__init__()
@@ -679,7 +925,6 @@ class CreateProjectPage(UserControl):
         self.page = page
         self.new_project_name = ""
         self.new_project_id = ""
-        self.member_checkboxes = []
 
     def build(self):
         self.project_name_field = TextField(
@@ -764,15 +1009,11 @@ class CreateProjectPage(UserControl):
         self.set_new_project_name(project_name)
         self.set_new_project_id(project_id)
 
-        active_users = self.db.get_all_active_users()
-        self.member_checkboxes.clear()
-
-        current_user_id = self.db.get_user_by_username(self.username).get_id()
-        active_users = [user for user in active_users if user.get_id() != current_user_id]
-
-        for user in active_users:
-            cb = Checkbox(label=user.get_username(), key=user.get_id())
-            self.member_checkboxes.append(cb)
+        current_user_id = self.db.get_current_user_id(self.page)
+        self.member_picker = UserPicker(
+            lambda prefix, limit, offset: self.db.search_users(prefix, limit, offset, exclude_ids=[current_user_id]),
+            self.page
+        )
 
         self.select_members_column.controls = [
             Text(
@@ -781,7 +1022,7 @@ class CreateProjectPage(UserControl):
                 weight=ft.FontWeight.BOLD,
                 color=self.page.theme.color_scheme.primary
             ),
-            Column(self.member_checkboxes, alignment=CrossAxisAlignment.CENTER),  # Center checkboxes
+            self.member_picker,
             Row(
                 [
                     ElevatedButton(
@@ -810,8 +1051,9 @@ class CreateProjectPage(UserControl):
         self.update()
 
     def create_project_confirm(self, e):
-        selected_user_ids = [cb.key for cb in self.member_checkboxes if cb.value]
-        selected_usernames = [self.db.get_user_by_id(user_id).get_username() for user_id in selected_user_ids]
+        selected_user_ids = self.member_picker.get_selected_ids()
+        selected_users = self.db.get_users_by_ids(selected_user_ids)
+        selected_usernames = [selected_users[user_id].get_username() for user_id in selected_user_ids]
 
 
         # if not selected_user_ids:
@@ -954,6 +1196,17 @@ class ProjectManagementPage(UserControl):
                          padding=Padding(15, 10, 15, 10)
                     )
                 ),
+                ElevatedButton(
+                    text="See Archived Tasks",
+                    on_click=self.show_archived_tasks,
+                    width=300,
+                    style=ButtonStyle(
+                        bgcolor=self.page.theme.color_scheme.primary_container,
+                        color={"": colors.WHITE},
+                        shape=RoundedRectangleBorder(radius=10),
+                        padding=Padding(15, 10, 15, 10)
+                    )
+                ),
                 ElevatedButton(
                     text="Back",
                     on_click=lambda e: self.page.go("/main"),
@@ -1027,29 +1280,94 @@ class ProjectManagementPage(UserControl):
         self.page.update()
         logger.info(f"User '{self.username}' viewed tasks for project ID '{self.project_id}'.")
 
+    def show_archived_tasks(self, e):
+        self.page.go(f"/archived_tasks/{self.project_id}")
+        self.page.update()
+        logger.info(f"User '{self.username}' viewed archived tasks for project ID '{self.project_id}'.")
+
+class ArchivedTasksPage(UserControl):
+    def __init__(self, db, project_id, page):
+        super().__init__()
+        self.db = db
+        self.project_id = project_id
+        self.page = page
+
+    def build(self):
+        tasks = self.db.get_archived_project_tasks(self.project_id)
+        controls = [
+            ElevatedButton(
+                text=f"{task.get_title()} [{task.get_priority().name}] ended {task.get_end_datetime():%Y-%m-%d %H:%M}",
+                on_click=lambda e, task_id=task.get_task_id(): self.page.go(f"/show_task_details/{task_id}"),
+                width=300,
+                style=ButtonStyle(
+                    bgcolor=self.page.theme.color_scheme.primary,
+                    color={"": colors.WHITE},
+                    shape=RoundedRectangleBorder(radius=10),
+                    padding=Padding(15, 10, 15, 10)
+                )
+            )
+            for task in tasks
+        ]
+
+        return Container(
+            content=Column(
+                controls=[
+                    Text("Archived Tasks", size=30, weight=FontWeight.BOLD, color=self.page.theme.color_scheme.on_secondary),
+                    *(controls or [Text("No archived tasks.", italic=True)]),
+                    ElevatedButton(
+                        text="Back",
+                        on_click=lambda e: self.page.go(f"/project_management/{self.project_id}"),
+                        width=300,
+                        style=ButtonStyle(
+                            bgcolor={"": colors.BLUE_ACCENT_700},
+                            color={"": colors.WHITE},
+                            shape=RoundedRectangleBorder(radius=10),
+                            padding=Padding(15, 10, 15, 10)
+                        )
+                    )
+                ],
+                alignment=MainAxisAlignment.CENTER,
+                horizontal_alignment=CrossAxisAlignment.CENTER,
+                spacing=20
+            ),
+            alignment=ft.alignment.center,
+            padding=20
+        )
+
 class ShowTasksWindow(UserControl):
     def __init__(self, db, project_id, page):
         super().__init__()
         self.db = db
         self.project_id = project_id
         self.page = page
+        self.selected_task_ids = set()
 
     def build(self):
         project = self.db.get_project(self.project_id)
-        tasks = self.db.get_project_tasks(self.project_id)
-        tasks_by_status = self.group_tasks_by_status(tasks)
+        tasks_by_status = self.db.get_project_board(self.project_id)
+        users = self.db.get_users_by_ids([assignee_id for task_list in tasks_by_status.values() for task in task_list for assignee_id in task.get_assignees()])
+        counters = self.db.get_project_counters(self.project_id)
+        # Same rules as ShowTaskDetailsWindow: the leader sets priority and assignees, assignees set status
+        principal = self.db.get_principal(self.page)
+        self.is_leader = principal.is_leader_of(self.project_id)
+        self.assigned_task_ids = {task.get_task_id() for task_list in tasks_by_status.values() for task in task_list if principal.get_user_id() in task.get_assignees()}
 
         task_controls = []
         for status in Status:
-            task_list = tasks_by_status.get(status, [])
+            task_list = tasks_by_status[status]
             if not task_list:
                 continue
 
             task_data_rows = []
 
-            for task in sorted(task_list, key=lambda task: task.get_priority(), reverse=False):
-                assignees = ", ".join([self.db.get_user_by_id(assignee_id).get_username() for assignee_id in task.get_assignees()])
+            for task in task_list:
+                assignees = ", ".join([users[assignee_id].get_username() for assignee_id in task.get_assignees()])
                 task_data_rows.append(ft.DataRow(cells=[
+                    ft.DataCell(Checkbox(
+                        value=task.get_task_id() in self.selected_task_ids,
+                        disabled=not self.is_leader and task.get_task_id() not in self.assigned_task_ids,
+                        on_change=lambda e, task_id=task.get_task_id(): self.toggle_task(task_id, e.control.value)
+                    )),
                     ft.DataCell(ft.Text(task.get_title())),
                     ft.DataCell(ft.Text(str(task.get_start_datetime()))),
                     ft.DataCell(ft.Text(str(task.get_end_datetime()))),
@@ -1071,6 +1389,7 @@ class ShowTasksWindow(UserControl):
 
             task_data_table = ft.DataTable(
                 columns=[
+                    ft.DataColumn(ft.Text("Select")),
                     ft.DataColumn(ft.Text("Title")),
                     ft.DataColumn(ft.Text("Start Date")),
                     ft.DataColumn(ft.Text("End Date")),
@@ -1082,7 +1401,7 @@ class ShowTasksWindow(UserControl):
             )
 
             task_controls.append(ft.Column([
-                ft.Text(f"{status.value} Tasks", size=20, weight=ft.FontWeight.BOLD,  color=self.page.theme.color_scheme.on_secondary),
+                ft.Text(f"{status.value} Tasks ({counters['status'][status]})", size=20, weight=ft.FontWeight.BOLD,  color=self.page.theme.color_scheme.on_secondary),
                 task_data_table
             ]))
 
@@ -1090,6 +1409,8 @@ class ShowTasksWindow(UserControl):
             content=ft.Column(
                 controls=[
                     ft.Text(f"Tasks of Project '{project.get_project_name()}'", size=30, weight=ft.FontWeight.BOLD,  color=self.page.theme.color_scheme.on_secondary),
+                    ft.Text(f"{counters['total']} tasks: " + ", ".join(f"{count} {priority.name}" for priority, count in counters["priority"].items() if count), size=16, color=self.page.theme.color_scheme.on_secondary),
+                    self._build_bulk_actions(),
                     *task_controls,
                     ElevatedButton(
                         text="Back",
@@ -1113,12 +1434,134 @@ class ShowTasksWindow(UserControl):
             expand=True
         )
 
-    def group_tasks_by_status(self, tasks):
-        tasks_by_status = {status: [] for status in Status}
-        for task in tasks:
-            status = task.get_status()
-            tasks_by_status[status].append(task)
-        return tasks_by_status
+    def _build_bulk_actions(self):
+        self.bulk_status_dropdown = ft.Dropdown(label="Status", options=[ft.dropdown.Option(status.name) for status in Status], width=160)
+        self.bulk_priority_dropdown = ft.Dropdown(label="Priority", options=[ft.dropdown.Option(priority.name) for priority in Priority], width=160)
+        button_style = ButtonStyle(
+            bgcolor=self.page.theme.color_scheme.secondary,
+            color={"": colors.WHITE},
+            shape=RoundedRectangleBorder(radius=10),
+            padding=Padding(15, 10, 15, 10)
+        )
+        controls = [
+            self.bulk_status_dropdown,
+            ElevatedButton(text="Set Status", on_click=self.bulk_change_status, style=button_style),
+        ]
+        if self.is_leader:
+            controls.extend([
+                self.bulk_priority_dropdown,
+                ElevatedButton(text="Set Priority", on_click=self.bulk_change_priority, style=button_style),
+                ElevatedButton(text="Assign Selected", on_click=self.show_bulk_assign, style=button_style),
+            ])
+        return Row(
+            controls,
+            alignment=MainAxisAlignment.CENTER,
+            wrap=True,
+            spacing=10
+        )
+
+    def toggle_task(self, task_id, checked):
+        if checked:
+            self.selected_task_ids.add(task_id)
+        else:
+            self.selected_task_ids.discard(task_id)
+
+    def _show_bulk_result(self, message):
+        self.page.snack_bar = ft.SnackBar(content=ft.Text(message))
+        self.page.snack_bar.open = True
+        self.page.go(f"/show_tasks/{self.project_id}")
+        self.page.update()
+
+    def _require_selection(self, value=True):
+        if not self.selected_task_ids or not value:
+            self.page.snack_bar = ft.SnackBar(content=ft.Text("Please select tasks and a value first!"))
+            self.page.snack_bar.open = True
+            self.page.update()
+            return False
+        return True
+
+    def bulk_change_status(self, e):
+        if not self._require_selection(self.bulk_status_dropdown.value):
+            return
+        task_ids = self.selected_task_ids & self.assigned_task_ids
+        if not task_ids:
+            self.page.snack_bar = ft.SnackBar(content=ft.Text("You can only change the status of tasks assigned to you!"))
+            self.page.snack_bar.open = True
+            self.page.update()
+            return
+        username = self.db.get_current_user_username(self.page)
+        changed = self.db.bulk_change_status(task_ids, Status[self.bulk_status_dropdown.value], username)
+        logger.info(f"User '{username}' changed status of {changed} tasks in project '{self.project_id}' to '{self.bulk_status_dropdown.value}'.")
+        self._show_bulk_result(f"Status changed on {changed} tasks.")
+
+    def bulk_change_priority(self, e):
+        if not self.is_leader or not self._require_selection(self.bulk_priority_dropdown.value):
+            return
+        username = self.db.get_current_user_username(self.page)
+        changed = self.db.bulk_change_priority(self.selected_task_ids, Priority[self.bulk_priority_dropdown.value], username)
+        logger.info(f"User '{username}' changed priority of {changed} tasks in project '{self.project_id}' to '{self.bulk_priority_dropdown.value}'.")
+        self._show_bulk_result(f"Priority changed on {changed} tasks.")
+
+    def show_bulk_assign(self, e):
+        if not self.is_leader or not self._require_selection():
+            return
+        self.assignee_picker = UserPicker(
+            lambda prefix, limit, offset: self.db.get_project_users(self.project_id, prefix, limit, offset),
+            self.page
+        )
+        self.page.views.append(
+            ft.View(
+                "/bulk_assign",
+                [
+                    Container(
+                        content=Column(
+                            controls=[
+                                Text(f"Assign {len(self.selected_task_ids)} Tasks", size=30, weight=FontWeight.BOLD, color=self.page.theme.color_scheme.on_secondary),
+                                self.assignee_picker,
+                                ElevatedButton(
+                                    text="Assign",
+                                    on_click=self.bulk_assign,
+                                    width=300,
+                                    style=ButtonStyle(
+                                        bgcolor={"": colors.GREEN_ACCENT_700},
+                                        color={"": colors.WHITE},
+                                        shape=RoundedRectangleBorder(radius=10),
+                                        padding=Padding(15, 10, 15, 10)
+                                    )
+                                ),
+                                ElevatedButton(
+                                    text="Back",
+                                    on_click=lambda e: self.page.go(f"/show_tasks/{self.project_id}"),
+                                    width=300,
+                                    style=ButtonStyle(
+                                        bgcolor={"": colors.RED_ACCENT_700},
+                                        color={"": colors.WHITE},
+                                        shape=RoundedRectangleBorder(radius=10),
+                                        padding=Padding(15, 10, 15, 10)
+                                    )
+                                )
+                            ],
+                            alignment=MainAxisAlignment.CENTER,
+                            horizontal_alignment=CrossAxisAlignment.CENTER,
+                            spacing=20
+                        ),
+                        bgcolor=self.page.theme.color_scheme.background,
+                        padding=20,
+                        alignment=ft.alignment.center,
+                    )
+                ],
+                scroll=ft.ScrollMode.ALWAYS,
+                bgcolor=self.page.theme.color_scheme.background,
+            )
+        )
+        self.page.update()
+
+    def bulk_assign(self, e):
+        user_ids = self.assignee_picker.get_selected_ids()
+        username = self.db.get_current_user_username(self.page)
+        added = self.db.bulk_assign(self.selected_task_ids, user_ids, username)
+        logger.info(f"User '{username}' made {added} assignments across {len(self.selected_task_ids)} tasks in project '{self.project_id}'.")
+        self._show_bulk_result(f"{added} assignments added.")
 
     def show_task_details(self, task_id):
         self.page.go(f"/show_task_details/{task_id}")
@@ -1139,6 +1582,10 @@ class ShowTaskDetailsWindow(UserControl):
         task = self.db.get_task(self.task_id)
         project_id = task.get_project_id()
         project = self.db.get_project(project_id)
+        assignees = self.db.get_users_by_ids(task.get_assignees())
+        assignee_names = [assignees[assignee_id].get_username() for assignee_id in task.get_assignees()]
+        # Archived tasks live outside main.tasks and are read-only
+        archived = self.db.is_archived(task_id)
 
         task_details_controls = [
             Text(f"Description: {task.get_description()}", size=20),
@@ -1146,7 +1593,7 @@ class ShowTaskDetailsWindow(UserControl):
             Text(f"Status: {task.get_status().name}", size=20),
             Text(f"Start Date: {task.get_start_datetime()}", size=20),
             Text(f"End Date: {task.get_end_datetime()}", size=20),
-            Text(f"Assignees: {', '.join([self.db.get_user_by_id(assignee_id).get_username() for assignee_id in task.get_assignees()])}", size=20),
+            Text(f"Assignees: {', '.join(assignee_names)}", size=20),
             ElevatedButton(
                 text="Show Comments",
                 on_click=lambda e: self.show_comments(task_id),
@@ -1171,8 +1618,7 @@ class ShowTaskDetailsWindow(UserControl):
             ),
         ]
 
-        assignee_names = [self.db.get_user_by_id(task_assignee).get_username() for task_assignee in task.get_assignees()]
-        if self.db.get_current_user(self.page).get_username() in assignee_names:
+        if not archived and self.db.get_current_user_username(self.page) in assignee_names:
             task_details_controls.append(
                 ElevatedButton(
                     text="Change Status",
@@ -1187,7 +1633,7 @@ class ShowTaskDetailsWindow(UserControl):
                 )
             )
 
-        if self.db.get_current_user_id(self.page) == project.get_leader_id():
+        if not archived and self.db.get_principal(self.page).is_leader_of(project.get_project_id()):
             task_details_controls.append(
                 ElevatedButton(
                     text="Change Priority",
@@ -1287,7 +1733,10 @@ class ShowTaskDetailsWindow(UserControl):
 
     def cancel_dialog(self):
         project_id = self.db.get_task(self.task_id).get_project_id()
-        self.page.go(f"/show_tasks/{project_id}")
+        if self.db.is_archived(self.task_id):
+            self.page.go(f"/archived_tasks/{project_id}")
+        else:
+            self.page.go(f"/show_tasks/{project_id}")
         self.page.update()
 
 class ShowCommentWindow(UserControl):
@@ -1298,54 +1747,82 @@ class ShowCommentWindow(UserControl):
         self.page = page
         self.add_comment_field = ft.TextField(label="Add Comment:", color=self.page.theme.color_scheme.on_secondary)
         self.username = db.get_current_user_username(page)
+        self.comments = []
+        self.earlier_cursor = None
+        self.archived = False
 
     def build(self):
         return self._build_comment_view()
 
     def _build_comment_view(self):
-        comments = self.db.get_task_comments(self.task_id)
-        comment_boxes = self._build_comment_boxes(comments)
+        self.archived = self.db.is_archived(self.task_id)
+        if self.archived:
+            # The paged getters only read main; an archived task comes back with all its comments
+            self.comments, self.earlier_cursor = self.db.get_archived_task(self.task_id).comments, None
+        else:
+            self.comments, self.earlier_cursor = self.db.get_task_comments_page(self.task_id)
 
         self.comment_column = ft.Column(
-            controls=[
-                ft.Text("Comments", size=30, weight=ft.FontWeight.BOLD, color=self.page.theme.color_scheme.on_secondary),
-                *comment_boxes,
-                self.add_comment_field,
+            controls=self._build_comment_controls(),
+            alignment=MainAxisAlignment.CENTER,
+            horizontal_alignment=CrossAxisAlignment.CENTER,
+            spacing=20
+        )
+
+        return ft.Container(
+            content=self.comment_column,
+            alignment=ft.alignment.center,
+            padding=20,
+            bgcolor=self.page.theme.color_scheme.background,
+            expand=True
+        )
+
+    def _build_comment_controls(self):
+        controls = [ft.Text("Comments", size=30, weight=ft.FontWeight.BOLD, color=self.page.theme.color_scheme.on_secondary)]
+        if self.earlier_cursor:
+            controls.append(
                 ElevatedButton(
-                    text="Add Comment",
-                    on_click=self.add_comment,
+                    text="Load Earlier Comments",
+                    on_click=self.load_earlier_comments,
                     width=300,
                     style=ButtonStyle(
-                        bgcolor=self.page.theme.color_scheme.on_primary,
+                        bgcolor=self.page.theme.color_scheme.secondary,
                         color={"": colors.WHITE},
                         shape=RoundedRectangleBorder(radius=10),
                         padding=Padding(15, 10, 15, 10)
                     )
-                ),
+                )
+            )
+        controls.extend(self._build_comment_boxes(self.comments))
+        if not self.archived:
+            controls.append(self.add_comment_field)
+            controls.append(
                 ElevatedButton(
-                    text="Back",
-                    on_click=self.go_back,
+                    text="Add Comment",
+                    on_click=self.add_comment,
                     width=300,
                     style=ButtonStyle(
-                        bgcolor=self.page.theme.color_scheme.primary,
+                        bgcolor=self.page.theme.color_scheme.on_primary,
                         color={"": colors.WHITE},
                         shape=RoundedRectangleBorder(radius=10),
                         padding=Padding(15, 10, 15, 10)
                     )
                 )
-            ],
-            alignment=MainAxisAlignment.CENTER,
-            horizontal_alignment=CrossAxisAlignment.CENTER,
-            spacing=20
-        )
-
-        return ft.Container(
-            content=self.comment_column,
-            alignment=ft.alignment.center,
-            padding=20,
-            bgcolor=self.page.theme.color_scheme.background,
-            expand=True
-        )
+            )
+        return [
+            *controls,
+            ElevatedButton(
+                text="Back",
+                on_click=self.go_back,
+                width=300,
+                style=ButtonStyle(
+                    bgcolor=self.page.theme.color_scheme.primary,
+                    color={"": colors.WHITE},
+                    shape=RoundedRectangleBorder(radius=10),
+                    padding=Padding(15, 10, 15, 10)
+                )
+            )
+        ]
 
     def _build_comment_boxes(self, comments):
         comment_boxes = []
@@ -1357,7 +1834,7 @@ class ShowCommentWindow(UserControl):
                 timestamp = comment.get_timestamp()
                 content = comment.get_content()
                 delete_button = None
-                if author == self.username:
+                if author == self.username and not self.archived:
                     delete_button = ElevatedButton(
                         text="Delete",
                         on_click=lambda e, comment_content=content, comment_timestamp=timestamp: self.delete_comment(comment_content, comment_timestamp),
@@ -1397,48 +1874,31 @@ class ShowCommentWindow(UserControl):
         comment_content = self.add_comment_field.value
         if comment_content:
             username = self.username
-            self.db.add_comment(self.task_id, username, comment_content)
-            self.db.add_task_history(self.task_id, f"Added comment: '{comment_content}'", username)
+            with self.db.transaction():
+                self.db.add_comment(self.task_id, username, comment_content)
+                self.db.add_task_history(self.task_id, f"Added comment: '{comment_content}'", username)
             self.add_comment_field.value = ""
             self.refresh_comments()
             logger.info(f"User '{username}' added the comment '{comment_content}' to task ID '{self.task_id}'.")
 
     def delete_comment(self, comment_content, timestamp):
-        self.db.delete_comment(self.task_id, self.username, comment_content, timestamp)
-        self.db.add_task_history(self.task_id, f"Deleted comment: '{comment_content}'", self.username)
+        with self.db.transaction():
+            self.db.delete_comment(self.task_id, self.username, comment_content, timestamp)
+            self.db.add_task_history(self.task_id, f"Deleted comment: '{comment_content}'", self.username)
         self.refresh_comments()
         logger.info(f"User '{self.username}' deleted the comment '{comment_content}' from task ID '{self.task_id}'.")
 
     def refresh_comments(self):
-        comments = self.db.get_task_comments(self.task_id)
-        comment_boxes = self._build_comment_boxes(comments)
-        self.comment_column.controls = [
-            ft.Text("Comments", size=30, weight=ft.FontWeight.BOLD, color=self.page.theme.color_scheme.on_secondary),
-            *comment_boxes,
-            self.add_comment_field,
-            ElevatedButton(
-                text="Add Comment",
-                on_click=self.add_comment,
-                width=300,
-                style=ButtonStyle(
-                    bgcolor=self.page.theme.color_scheme.on_primary,
-                    color={"": colors.WHITE},
-                    shape=RoundedRectangleBorder(radius=10),
-                    padding=Padding(15, 10, 15, 10)
-                )
-            ),
-            ElevatedButton(
-                text="Back",
-                on_click=self.go_back,
-                width=300,
-                style=ButtonStyle(
-                    bgcolor=self.page.theme.color_scheme.primary,
-                    color={"": colors.WHITE},
-                    shape=RoundedRectangleBorder(radius=10),
-                    padding=Padding(15, 10, 15, 10)
-                )
-            )
-        ]
+        # Reload as many of the newest comments as are on screen, plus room for a new one
+        limit = max(PAGE_SIZE, len(self.comments) + 1)
+        self.comments, self.earlier_cursor = self.db.get_task_comments_page(self.task_id, limit=limit)
+        self.comment_column.controls = self._build_comment_controls()
+        self.comment_column.update()
+
+    def load_earlier_comments(self, e):
+        earlier_comments, self.earlier_cursor = self.db.get_task_comments_page(self.task_id, before=self.earlier_cursor)
+        self.comments = earlier_comments + self.comments
+        self.comment_column.controls = self._build_comment_controls()
         self.comment_column.update()
 
     def go_back(self, e):
@@ -1511,12 +1971,13 @@ class ChangePriorityWindow(UserControl):
         new_priority = Priority[new_priority_value]
 
         if current_priority != new_priority:
-            self.db.change_priority(self.task_id, new_priority)
-            self.db.add_task_history(
-                self.task_id,
-                f"Changed priority from {current_priority.name} to {new_priority.name}",
-                self.db.get_current_user_username(self.page)
-            )
+            with self.db.transaction():
+                self.db.change_priority(self.task_id, new_priority)
+                self.db.add_task_history(
+                    self.task_id,
+                    f"Changed priority from {current_priority.name} to {new_priority.name}",
+                    self.db.get_current_user_username(self.page)
+                )
 
         username = self.db.get_current_user_username(self.page)
         logger.info(f"User '{username}' changed priority of task '{task.get_title()}' from '{current_priority.name}' to '{new_priority.name}'.")
@@ -1557,12 +2018,13 @@ class ChangeStatusWindow(UserControl):
         task = self.db.get_task(self.task_id)
         current_status = task.get_status()
         new_status = self.status_dropdown.value
-        self.db.change_status(self.task_id, new_status)
-        self.db.add_task_history(
-                self.task_id, 
-                f"Changed status from {current_status} to {new_status}", 
-                self.db.get_current_user_username(self.page)
-            )
+        with self.db.transaction():
+            self.db.change_status(self.task_id, new_status)
+            self.db.add_task_history(
+                    self.task_id, 
+                    f"Changed status from {current_status} to {new_status}", 
+                    self.db.get_current_user_username(self.page)
+                )
         
         username = self.db.get_current_user_username(self.page) 
         logger.info(f"User '{username}' changed status of task '{task.get_title()}' from '{current_status}' to '{new_status}'.")
@@ -1585,34 +2047,18 @@ class ShowHistoryWindow(UserControl):
 
     def build(self):
         task = self.db.get_task(self.task_id)
-        history_entries = self.db.get_task_history(self.task_id)
-
-        history_controls = []
-        if not history_entries:
-            history_controls.append(ft.Text("No history yet.", size=20))
+        if self.db.is_archived(self.task_id):
+            # get_task already loaded the whole history of an archived task
+            self.history_entries, self.earlier_cursor = task.history, None
         else:
-            for history in history_entries:
-                history_controls.append(
-                    ft.Container(
-                        content=ft.Column([
-                            ft.Text(f"{history.get_author()}", size=14, weight=ft.FontWeight.BOLD),
-                            ft.Text(f"{history.get_action()}", size=16),
-                            ft.Text(f"at: {history.get_timestamp()}", size=12, italic=True, color=colors.GREY),
-                        ]),
-                        padding=10,
-                        border=ft.border.all(1, color=colors.GREY),
-                        border_radius=10,
-                        margin=10,
-                        bgcolor=self.page.theme.color_scheme.on_primary,
-                        shadow=ft.BoxShadow(blur_radius=5, spread_radius=1, color=colors.GREY, offset=ft.Offset(2, 2))
-                    )
-                )
+            self.history_entries, self.earlier_cursor = self.db.get_task_history_page(self.task_id)
+        self.history_column = ft.Column(self._build_history_controls(), horizontal_alignment=CrossAxisAlignment.CENTER)
 
         return ft.Container(
             content=ft.Column(
                 controls=[
                     ft.Text(f"History of Task '{task.get_title()}'", size=30, weight=ft.FontWeight.BOLD,  color=self.page.theme.color_scheme.on_secondary),
-                    *history_controls,
+                    self.history_column,
                     ElevatedButton(
                         text="Back",
                         on_click=lambda e: self.page.go(f"/show_task_details/{self.task_id}"),
@@ -1635,6 +2081,49 @@ class ShowHistoryWindow(UserControl):
             expand=True
         )
 
+    def _build_history_controls(self):
+        history_controls = []
+        if self.earlier_cursor:
+            history_controls.append(
+                ElevatedButton(
+                    text="Load Earlier History",
+                    on_click=self.load_earlier_history,
+                    width=300,
+                    style=ButtonStyle(
+                        bgcolor=self.page.theme.color_scheme.secondary,
+                        color={"": colors.WHITE},
+                        shape=RoundedRectangleBorder(radius=10),
+                        padding=Padding(15, 10, 15, 10)
+                    )
+                )
+            )
+        if not self.history_entries:
+            history_controls.append(ft.Text("No history yet.", size=20))
+        else:
+            for history in self.history_entries:
+                history_controls.append(
+                    ft.Container(
+                        content=ft.Column([
+                            ft.Text(f"{history.get_author()}", size=14, weight=ft.FontWeight.BOLD),
+                            ft.Text(f"{history.get_action()}", size=16),
+                            ft.Text(f"at: {history.get_timestamp()}", size=12, italic=True, color=colors.GREY),
+                        ]),
+                        padding=10,
+                        border=ft.border.all(1, color=colors.GREY),
+                        border_radius=10,
+                        margin=10,
+                        bgcolor=self.page.theme.color_scheme.on_primary,
+                        shadow=ft.BoxShadow(blur_radius=5, spread_radius=1, color=colors.GREY, offset=ft.Offset(2, 2))
+                    )
+                )
+        return history_controls
+
+    def load_earlier_history(self, e):
+        earlier_entries, self.earlier_cursor = self.db.get_task_history_page(self.task_id, before=self.earlier_cursor)
+        self.history_entries = earlier_entries + self.history_entries
+        self.history_column.controls = self._build_history_controls()
+        self.history_column.update()
+
 
 class AddAssigneesWindow(UserControl):
     def __init__(self, db, task_id, page):
@@ -1644,23 +2133,16 @@ class AddAssigneesWindow(UserControl):
         self.page = page
 
     def build(self):
-        project_id = self.db.get_task(self.task_id).get_project_id()
-        active_users = self.db.get_project_member_ids(self.db.get_task(self.task_id).get_project_id())
-        active_users.append(self.db.get_project(project_id).get_leader_id())
-
-        current_assignees = self.db.get_task_assignees(self.task_id)
-
-        self.member_checkboxes = []
-        for user_id in active_users:
-            if user_id not in current_assignees:
-                cb = Checkbox(label=self.db.get_user_by_id(user_id).get_username(), key=user_id)
-                self.member_checkboxes.append(cb)
+        self.member_picker = UserPicker(
+            lambda prefix, limit, offset: self.db.get_assignable_users(self.task_id, prefix, limit, offset),
+            self.page
+        )
 
         return ft.Container(
             content=ft.Column(
                 controls=[
                     ft.Text("Add Assignees to Task", size=30, weight=ft.FontWeight.BOLD,  color=self.page.theme.color_scheme.on_secondary),
-                    ft.Column(self.member_checkboxes),
+                    self.member_picker,
                     ElevatedButton(
                         text="Save",
                         on_click=self.save_assignees,
@@ -1695,13 +2177,15 @@ class AddAssigneesWindow(UserControl):
         )
 
     def save_assignees(self, e):
-        selected_user_ids = [cb.key for cb in self.member_checkboxes if cb.value]
+        selected_user_ids = self.member_picker.get_selected_ids()
 
         task = self.db.get_task(self.task_id)
+        with self.db.transaction():
+            for user_id in selected_user_ids:
+                task.assign_user(user_id, self.db.get_current_user_username(self.page))
+                self.db.add_assignee(self.task_id, user_id)
+                self.db.add_task_history(self.task_id, f"Assigned user {self.db.get_user_by_id(user_id).get_username()}", self.db.get_current_user_username(self.page))
         for user_id in selected_user_ids:
-            task.assign_user(user_id, self.db.get_current_user_username(self.page))
-            self.db.add_assignee(self.task_id, user_id)
-            self.db.add_task_history(self.task_id, f"Assigned user {self.db.get_user_by_id(user_id).get_username()}", self.db.get_current_user_username(self.page))
             logger.info(f"User '{self.db.get_user_by_id(user_id).get_username()}' assigned to task '{task.get_title()}' by user '{self.db.get_current_user_username(self.page)}'.")
         self.page.dialog = None
         self.page.snack_bar = SnackBar(content=Text("Assignees added successfully!"))
@@ -1726,9 +2210,10 @@ class RemoveAssigneesWindow(UserControl):
         task = self.db.get_task(self.task_id)
         current_assignees = task.get_assignees()
 
+        users = self.db.get_users_by_ids(current_assignees)
         self.member_checkboxes = []
         for assignee_id in current_assignees:
-            user = self.db.get_user_by_id(assignee_id)
+            user = users[assignee_id]
             cb = Checkbox(label=user.get_username(), key=user.get_id())
             self.member_checkboxes.append(cb)
 
@@ -1774,10 +2259,12 @@ class RemoveAssigneesWindow(UserControl):
         selected_user_ids = [cb.key for cb in self.member_checkboxes if cb.value]
 
         task = self.db.get_task(self.task_id)
+        with self.db.transaction():
+            for user_id in selected_user_ids:
+                task.unassign_user(user_id, self.db.get_current_user_username(self.page))
+                self.db.remove_assignee(self.task_id, user_id)
+                self.db.add_task_history(self.task_id, f"Unassigned user {self.db.get_user_by_id(user_id).get_username()}", self.db.get_current_user_username(self.page))
         for user_id in selected_user_ids:
-            task.unassign_user(user_id, self.db.get_current_user_username(self.page))
-            self.db.remove_assignee(self.task_id, user_id)
-            self.db.add_task_history(self.task_id, f"Unassigned user {self.db.get_user_by_id(user_id).get_username()}", self.db.get_current_user_username(self.page))
             logger.info(f"User '{self.db.get_user_by_id(user_id).get_username()}' unassigned from task '{task.get_title()}' by user '{self.db.get_current_user_username(self.page)}'.")
         self.page.dialog = None
         self.page.snack_bar = SnackBar(content=Text("Assignees removed successfully!"))
@@ -1798,7 +2285,6 @@ class ProjectMembersWindow(UserControl):
         self.project_id = project_id
         self.page = page
         self.member_checkboxes = []
-        self.non_member_checkboxes = []
 
     def build(self):
         project_members = self.db.get_project_members(self.project_id)
@@ -1878,14 +2364,10 @@ class ProjectMembersWindow(UserControl):
         )
 
     def show_non_members(self, e):
-        member_ids = self.db.get_project_member_ids(self.project_id)
-        active_users = self.db.get_all_active_users()
-        self.non_member_checkboxes.clear()
-
-        for user in active_users:
-            if user.get_id() not in member_ids and user.get_id() != self.db.get_project(self.project_id).get_leader_id():
-                cb = Checkbox(label=user.get_username(), key=user.get_id())
-                self.non_member_checkboxes.append(cb)
+        self.non_member_picker = UserPicker(
+            lambda prefix, limit, offset: self.db.get_addable_users(self.project_id, prefix, limit, offset),
+            self.page
+        )
 
         self.page.views.append(
             ft.View(
@@ -1895,7 +2377,7 @@ class ProjectMembersWindow(UserControl):
                         content=Column(
                             controls=[
                                 Text("Add Members", size=30, weight=FontWeight.BOLD,  color=self.page.theme.color_scheme.on_secondary),
-                                Column(self.non_member_checkboxes, alignment=MainAxisAlignment.START, spacing=10),
+                                self.non_member_picker,
                                 ElevatedButton(
                                     text="Add Selected Members",
                                     on_click=self.add_members,
@@ -1935,10 +2417,12 @@ class ProjectMembersWindow(UserControl):
         self.page.update()
 
     def add_members(self, e):
-        selected_user_ids = [cb.key for cb in self.non_member_checkboxes if cb.value]
+        selected_user_ids = self.non_member_picker.get_selected_ids()
         if len(selected_user_ids) > 0:
+            with self.db.transaction():
+                for user_id in selected_user_ids:
+                    self.db.add_project_member(self.project_id, user_id)
             for user_id in selected_user_ids:
-                self.db.add_project_member(self.project_id, user_id)
                 logger.info(f"User '{self.db.get_user_by_id(user_id).get_username()}' added to project '{self.project_id}' by user '{self.db.get_current_user_username(self.page)}'.")
 
             self.update_member_checkboxes()
@@ -1955,12 +2439,8 @@ class ProjectMembersWindow(UserControl):
     def remove_members(self, e):
         selected_member_ids = [cb.key for cb in self.member_checkboxes if cb.value]
         if len(selected_member_ids) > 0:
+            self.db.remove_project_members(self.project_id, selected_member_ids, self.db.get_current_user_username(self.page))
             for member_id in selected_member_ids:
-                self.db.remove_project_member(self.project_id, member_id)
-                project_tasks = self.db.get_project_tasks(self.project_id)
-                for task in project_tasks:
-                    self.db.remove_assignee(task.get_task_id(), member_id)
-                    self.db.add_task_history(task.get_task_id(), f"Unassigned user {self.db.get_user_by_id(member_id).get_username()} due to removal from project", self.db.get_current_user_username(self.page))
                 logger.info(f"User '{self.db.get_user_by_id(member_id).get_username()}' removed from project '{self.project_id}' by user '{self.db.get_current_user_username(self.page)}'.")
             self.update_member_checkboxes()
             self.page.snack_bar = ft.SnackBar(content=ft.Text("Members removed and unassigned from tasks successfully!"))
@@ -2057,14 +2537,11 @@ class AddTaskWindow(UserControl):
             bgcolor=self.page.theme.color_scheme.on_background,
         )
 
-        self.member_checkboxes = []
         self.choose_assignees_label = Text("Choose Assignees:", size=20, weight=FontWeight.BOLD, color=self.page.theme.color_scheme.on_secondary)
-
-        active_users = self.db.get_project_members(self.project_id)
-        active_users.append(self.db.get_user_by_id(self.db.get_project(self.project_id).get_leader_id()))
-        for user in active_users:
-            cb = Checkbox(label=user.get_username(), key=user.get_id())
-            self.member_checkboxes.append(cb)
+        self.assignee_picker = UserPicker(
+            lambda prefix, limit, offset: self.db.get_project_users(self.project_id, prefix, limit, offset),
+            self.page
+        )
 
         return Container(
             content=Column(
@@ -2076,7 +2553,7 @@ class AddTaskWindow(UserControl):
                     start_date_button,
                     end_date_button,
                     self.choose_assignees_label,
-                    Column(self.member_checkboxes, alignment=MainAxisAlignment.START, spacing=10),
+                    self.assignee_picker,
                     ElevatedButton(
                         text="Save",
                         on_click=self.save_task,
@@ -2138,7 +2615,7 @@ class AddTaskWindow(UserControl):
         start_date = self.start_date_value
         end_date = self.end_date_value
 
-        selected_assignees = [cb.key for cb in self.member_checkboxes if cb.value]
+        selected_assignees = self.assignee_picker.get_selected_ids()
 
         new_task = Task(
             project_id=self.project_id,
@@ -2151,13 +2628,16 @@ class AddTaskWindow(UserControl):
             end_datetime=end_date
         )
 
-        self.db.add_task(new_task)
         task_id = new_task.get_task_id()
-        self.db.add_task_history(task_id, f"Created '{new_task.get_title()}' task", self.db.get_current_user_username(self.page))
+        assignees = self.db.get_users_by_ids(selected_assignees)
+        with self.db.transaction():
+            self.db.add_task(new_task)
+            self.db.add_task_history(task_id, f"Created '{new_task.get_title()}' task", self.db.get_current_user_username(self.page))
+            for assignee_id in selected_assignees:
+                self.db.add_task_history(task_id, f"Assigned user {assignees[assignee_id].get_username()} to task", self.db.get_current_user_username(self.page))
         logger.info(f"New task '{new_task.get_title()}' added to project {self.project_id} by user '{self.db.get_current_user_username(self.page)}'.")
         for assignee_id in selected_assignees:
-            username = self.db.get_user_by_id(assignee_id).get_username()
-            self.db.add_task_history(task_id, f"Assigned user {username} to task", self.db.get_current_user_username(self.page))
+            username = assignees[assignee_id].get_username()
             logger.info(f"User {username} assigned to task '{new_task.get_title()}' by user '{self.db.get_current_user_username(self.page)}'.")
         self.page.dialog = None
         self.page.snack_bar = SnackBar(content=Text("Task added successfully!"))
@@ -2177,7 +2657,6 @@ class AddTaskWindow(UserControl):
         self.page.update()
 
 def main(page: ft.Page):
-    db = Database()
 
 
 #light theme
@@ -2404,6 +2883,38 @@ def main(page: ft.Page):
                     bgcolor=page.theme.color_scheme.background
                 )
             )
+        elif page.route == "/my_tasks":
+            page.views.append(
+                ft.View(
+                    "/my_tasks",
+                    [
+                        ft.Container(
+                            content=ft.Column(
+                                [MyTasksPage(db, page)],
+                            ),
+                            bgcolor=page.theme.color_scheme.background
+                        ),
+                    ],
+                    scroll=ft.ScrollMode.ALWAYS,
+                    bgcolor=page.theme.color_scheme.background
+                )
+            )
+        elif page.route == "/search":
+            page.views.append(
+                ft.View(
+                    "/search",
+                    [
+                        ft.Container(
+                            content=ft.Column(
+                                [SearchPage(db, page)],
+                            ),
+                            bgcolor=page.theme.color_scheme.background
+                        ),
+                    ],
+                    scroll=ft.ScrollMode.ALWAYS,
+                    bgcolor=page.theme.color_scheme.background
+                )
+            )
         elif page.route == "/manage_users":
             page.views.append(
                 ft.View(
@@ -2548,6 +3059,24 @@ def main(page: ft.Page):
                 )
         )
 
+        elif page.route.startswith("/archived_tasks"):
+            project_id = page.route.split("/")[-1]
+            page.views.append(
+                ft.View(
+                    f"/archived_tasks/{project_id}",
+                    [
+                        ft.Container(
+                            content=ft.Column(
+                                [ArchivedTasksPage(db, project_id, page)],
+                            ),
+                            bgcolor=page.theme.color_scheme.background,
+                        ),
+                    ],
+                    scroll=ft.ScrollMode.ALWAYS,
+                    bgcolor=page.theme.color_scheme.background,
+                )
+            )
+
         elif page.route.startswith("/show_task_details"):
             task_id = page.route.split("/")[-1]
             page.views.append(
@@ -2672,13 +3201,20 @@ def main(page: ft.Page):
 
     def on_login(page, username):
         page.session.set("username", username)
+        page.session.set("principal", db.load_principal(username))
         page.go("/main")
 
     def on_signup(page, username):
         page.session.set("username", username)
+        page.session.set("principal", db.load_principal(username))
         page.go("/main")
 
     page.on_route_change = route_change
     page.go(page.route)
 
-ft.app(target=main, view=ft.AppView.FLET_APP)
+# Password hashing workers may re-import this module, so only the real entry point starts the app
+if __name__ == "__main__":
+    # One Database is shared by every session; it hands each handler thread its own connection
+    db = Database(DB_FILE)
+    backup_scheduler = BackupScheduler(db)
+    ft.app(target=main, view=ft.AppView.FLET_APP)
@@ -2,6 +2,11 @@ import argparse
 import sqlite3
 import hashlib
 from database import Database
+from importer import IMPORT_KINDS, read_records
+from exporter import EXPORT_FORMATS, export
+from backup import BACKUP_DIRECTORY, archive_backup_path
+from datetime import datetime, timedelta
+import os
 import logging
 
 logging.basicConfig(
@@ -18,9 +23,16 @@ logger = logging.getLogger(__name__)
 
 def main():
     parser = argparse.ArgumentParser(description="User Management System")
-    parser.add_argument("action", choices=["create-admin", "purge-data"], help="Action to perform")
+    parser.add_argument("action", choices=["create-admin", "purge-data", "import", "export", "backup", "archive"], help="Action to perform")
     parser.add_argument("--username", help="Admin username")
     parser.add_argument("--password", help="Admin password")
+    parser.add_argument("--kind", choices=IMPORT_KINDS, help="Kind of records to import")
+    parser.add_argument("--file", help="File to import from, export to, or write the backup to")
+    parser.add_argument("--format", choices=["csv", "jsonl", "json"], help="Import format (csv, jsonl; guessed from the extension by default) or export format (jsonl, json)")
+    parser.add_argument("--project", help="Export only this project ID")
+    parser.add_argument("--gzip", action="store_true", help="Compress the export with gzip")
+    parser.add_argument("--older-than", type=int, metavar="DAYS", help="Archive ARCHIVED tasks that ended more than DAYS days ago")
+    parser.add_argument("--batch-size", type=int, help="Rows written per transaction")
 
     args = parser.parse_args()
 
@@ -38,6 +50,39 @@ def main():
         db.purge_data()
         logger.info("All data purged successfully")
         print("All data purged successfully.")
+    elif args.action == "import":
+        if not args.kind or not args.file:
+            parser.error("import requires --kind and --file")
+        report = db.bulk_import(args.kind, read_records(args.file, args.format), args.batch_size)
+        for line_number, message in report.errors:
+            print(f"{args.file}:{line_number}: {message}")
+        if report.failed > len(report.errors):
+            print(f"... {report.failed - len(report.errors)} more errors not shown")
+        logger.info(f"Imported {report.imported} {args.kind} from '{args.file}', {report.failed} rows failed")
+        print(f"Imported {report.imported} {args.kind}, {report.failed} rows failed.")
+    elif args.action == "export":
+        if not args.file:
+            parser.error("export requires --file")
+        fmt = args.format or "jsonl"
+        if fmt not in EXPORT_FORMATS:
+            parser.error(f"export supports --format {' or '.join(EXPORT_FORMATS)}")
+        count = export(db, args.file, args.project, fmt, args.gzip or args.file.endswith(".gz"))
+        logger.info(f"Exported {count} records to '{args.file}'")
+        print(f"Exported {count} records to {args.file}.")
+    elif args.action == "backup":
+        destination = args.file
+        if not destination:
+            os.makedirs(BACKUP_DIRECTORY, exist_ok=True)
+            destination = os.path.join(BACKUP_DIRECTORY, f"database-{datetime.now():%Y%m%d-%H%M%S}.db")
+        db.backup(destination)
+        logger.info(f"Backup written to '{destination}' and '{archive_backup_path(destination)}'")
+        print(f"Backup written to {destination} and {archive_backup_path(destination)}.")
+    elif args.action == "archive":
+        if args.older_than is None:
+            parser.error("archive requires --older-than")
+        moved = db.archive_tasks(datetime.now() - timedelta(days=args.older_than))
+        logger.info(f"Moved {moved} archived tasks to '{db.archive_file}'")
+        print(f"Moved {moved} archived tasks to {db.archive_file}.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,134 @@
+import hashlib
+import hmac
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# PBKDF2-SHA256 work factor for new hashes; raising it rehashes users on their next login
+PBKDF2_ITERATIONS = 600000
+
+# Stored iteration counts above this are treated as corrupt rather than run
+MAX_PBKDF2_ITERATIONS = 10000000
+
+SHA256_HEX = re.compile(r"[0-9a-f]{64}")
+SALT_HEX = re.compile(r"(?:[0-9a-f]{2})+")
+
+
+class Pbkdf2Hasher:
+    """Salted PBKDF2-SHA256, stored as pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>."""
+
+    algorithm = "pbkdf2_sha256"
+
+    def __init__(self, iterations=PBKDF2_ITERATIONS):
+        self.iterations = iterations
+
+    def hash(self, password, salt=None):
+        salt = salt if salt is not None else os.urandom(16)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${salt.hex()}${digest.hex()}"
+
+    def _parse(self, encoded):
+        # Returns (iterations, salt, digest), or None for anything that is not one of our hashes
+        parts = encoded.split("$")
+        if len(parts) != 4 or parts[0] != self.algorithm or not parts[1].isdigit():
+            return None
+        iterations, salt, digest = int(parts[1]), parts[2], parts[3]
+        if not 1 <= iterations <= MAX_PBKDF2_ITERATIONS or not SALT_HEX.fullmatch(salt) or not SHA256_HEX.fullmatch(digest):
+            return None
+        return iterations, bytes.fromhex(salt), digest
+
+    def is_valid(self, encoded):
+        return is_legacy_hash(encoded) or self._parse(encoded) is not None
+
+    def verify(self, password, encoded):
+        if is_legacy_hash(encoded):
+            return hmac.compare_digest(legacy_hash(password), encoded)
+        parsed = self._parse(encoded)
+        if parsed is None:
+            return False
+        iterations, salt, digest = parsed
+        try:
+            expected = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+        except (ValueError, OverflowError):
+            return False
+        return hmac.compare_digest(expected.hex(), digest)
+
+    def needs_rehash(self, encoded):
+        if is_legacy_hash(encoded):
+            return True
+        parsed = self._parse(encoded)
+        return parsed is None or parsed[0] != self.iterations
+
+
+def legacy_hash(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def is_legacy_hash(encoded):
+    # Unsalted SHA-256 hex digests written before the KDF was introduced
+    return SHA256_HEX.fullmatch(encoded) is not None
+
+
+def _pool_context():
+    # Never fork: the app process already runs journal, backup and Flet threads
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _hash(hasher, password):
+    return hasher.hash(password)
+
+
+def _verify(hasher, password, encoded):
+    return hasher.verify(password, encoded)
+
+
+class PasswordHasher:
+    """Runs a hasher in a process pool so slow KDFs neither hold the GIL nor stall other sessions.
+
+    max_workers=0 hashes inline in the calling thread, which is what tests use with a cheap hasher.
+    """
+
+    def __init__(self, hasher=None, max_workers=None):
+        self.hasher = hasher if hasher is not None else Pbkdf2Hasher()
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Sessions log in from several threads; only one of them may start the pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_pool_context())
+            return self._executor
+
+    def _run(self, function, *args):
+        if self.max_workers == 0:
+            return function(self.hasher, *args)
+        return self._get_executor().submit(function, self.hasher, *args).result()
+
+    def hash(self, password):
+        return self._run(_hash, password)
+
+    def hash_many(self, passwords):
+        if self.max_workers == 0 or len(passwords) < 2:
+            return [self.hash(password) for password in passwords]
+        return list(self._get_executor().map(_hash, [self.hasher] * len(passwords), passwords, chunksize=16))
+
+    def verify(self, password, encoded):
+        return self._run(_verify, password, encoded)
+
+    def needs_rehash(self, encoded):
+        return self.hasher.needs_rehash(encoded)
+
+    def is_valid(self, encoded):
+        return self.hasher.is_valid(encoded)
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
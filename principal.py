@@ -0,0 +1,46 @@
+class Principal:
+    """The logged-in user of one session, resolved once and kept in page.session.
+
+    epoch is the user's invalidation counter at load time; Database.get_principal
+    reloads the principal once an admin or membership change has bumped it.
+    """
+
+    def __init__(self, user_id, username, is_admin, is_active, led_project_ids, member_project_ids, epoch):
+        self.user_id = user_id
+        self.username = username
+        self.is_admin = is_admin
+        self.is_active = is_active
+        self.led_project_ids = frozenset(led_project_ids)
+        self.member_project_ids = frozenset(member_project_ids)
+        self.epoch = epoch
+
+    def __repr__(self):
+        return f"Principal(user_id={self.user_id}, username='{self.username}', is_admin={self.is_admin}, epoch={self.epoch})"
+
+
+    def get_user_id(self):
+        return self.user_id
+
+
+    def get_username(self):
+        return self.username
+
+
+    def get_is_admin(self):
+        return self.is_admin
+
+
+    def get_is_active(self):
+        return self.is_active
+
+
+    def get_epoch(self):
+        return self.epoch
+
+
+    def is_leader_of(self, project_id):
+        return project_id in self.led_project_ids
+
+
+    def is_member_of(self, project_id):
+        return project_id in self.member_project_ids or project_id in self.led_project_ids
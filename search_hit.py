@@ -0,0 +1,35 @@
+class SearchHit:
+    def __init__(self, kind, task_id, project_id, title, snippet, rank):
+        self.kind = kind
+        self.task_id = task_id
+        self.project_id = project_id
+        self.title = title
+        self.snippet = snippet
+        self.rank = rank
+
+    def __repr__(self):
+        return f"SearchHit(kind='{self.kind}', task_id='{self.task_id}', title='{self.title}', rank={self.rank})"
+
+
+    def get_kind(self):
+        return self.kind
+
+
+    def get_task_id(self):
+        return self.task_id
+
+
+    def get_project_id(self):
+        return self.project_id
+
+
+    def get_title(self):
+        return self.title
+
+
+    def get_snippet(self):
+        return self.snippet
+
+
+    def get_rank(self):
+        return self.rank
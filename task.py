@@ -9,8 +9,10 @@ class Priority(Enum):
     MEDIUM = "MEDIUM"
     LOW = "LOW"
     def __lt__(self, other):
-        priority_order = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
-        return priority_order.index(self.name) < priority_order.index(other.name)
+        return PRIORITY_RANKS[self] < PRIORITY_RANKS[other]
+
+# Matches the priority_rank column computed in the database
+PRIORITY_RANKS = {Priority.CRITICAL: 0, Priority.HIGH: 1, Priority.MEDIUM: 2, Priority.LOW: 3}
 
 class Status(Enum):
     BACKLOG = "BACKLOG"
@@ -174,8 +176,8 @@ class Task:
    
 
     def to_dict(self):
-        assignees = ", ".join(map(str, self.assignees))
         comments = [comment.to_dict() for comment in self.comments]
+        history = [entry.to_dict() for entry in self.history]
         return {
             "task_id": self.task_id,
             "project_id": self.project_id,
@@ -185,8 +187,8 @@ class Task:
             "end_datetime": self.end_datetime.strftime("%Y-%m-%d %H:%M:%S"),
             "priority": self.priority.name,
             "status": self.status.name,
-            "assignees": assignees,
-            "history": self.history,
+            "assignees": list(self.assignees),
+            "history": history,
             "comments": comments
         }
 
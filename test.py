@@ -1,16 +1,33 @@
 import unittest
-from database import Database
+from database import Database, MIGRATIONS, ARCHIVED_TABLES
+from async_database import AsyncDatabase
+from passwords import PasswordHasher, Pbkdf2Hasher
+from importer import read_records
+from exporter import export
+from backup import BackupScheduler
+from debouncer import Debouncer
+import gzip
+import orjson
 import sqlite3
 import hashlib
 import re
 from project import Project
 from user import User
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from history import History
 import uuid
 from flet import *
 from task import *
 import os 
+import shutil
+import tempfile
+import threading
+import asyncio
+
+def fast_hasher():
+    # A cheap work factor hashed inline keeps the suite fast
+    return PasswordHasher(Pbkdf2Hasher(iterations=1000), max_workers=0)
+
 
 class TestDatabase(unittest.TestCase):
     DB_FILE = 'test_database.db' 
@@ -18,14 +35,15 @@ class TestDatabase(unittest.TestCase):
     def setUp(self):
         if os.path.exists(self.DB_FILE):
             os.remove(self.DB_FILE)  
-        self.db = Database(self.DB_FILE) 
+        self.db = Database(self.DB_FILE, password_hasher=fast_hasher()) 
         self.db.create_tables()  
 
 
     def tearDown(self):
-        self.db.conn.close()
-        if os.path.exists(self.DB_FILE):
-            os.remove(self.DB_FILE)
+        self.db.close()
+        for path in (self.DB_FILE, self.DB_FILE + "-wal", self.DB_FILE + "-shm", self.db.archive_file):
+            if os.path.exists(path):
+                os.remove(path)
 
     def test_add_user(self):
         self.db.add_user("test_user", "password", "test_user@example.com")
@@ -91,12 +109,414 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(history[1].action, "Updated")
 
 
+    def test_get_task_history_page(self):
+        for i in range(5):
+            self.db.conn.execute("INSERT INTO task_history (task_id, action, timestamp, author) VALUES (?, ?, ?, ?)", ("task_id", f"Action {i}", 1000 + i // 2, "user1"))
+        self.db.conn.commit()
+
+        page, before = self.db.get_task_history_page("task_id", limit=2)
+        self.assertEqual([entry.get_action() for entry in page], ["Action 3", "Action 4"])
+        actions = [entry.get_action() for entry in page]
+        while before:
+            page, before = self.db.get_task_history_page("task_id", limit=2, before=before)
+            actions = [entry.get_action() for entry in page] + actions
+        self.assertEqual(actions, [f"Action {i}" for i in range(5)])
+
+    def test_get_task_comments_page(self):
+        for i in range(3):
+            self.db.add_comment("task_id", "user1", f"Comment {i}")
+        page, before = self.db.get_task_comments_page("task_id", limit=2)
+        self.assertEqual([comment.get_content() for comment in page], ["Comment 1", "Comment 2"])
+        page, before = self.db.get_task_comments_page("task_id", limit=2, before=before)
+        self.assertEqual([comment.get_content() for comment in page], ["Comment 0"])
+        self.assertIsNone(before)
+
+        plans = self._query_plans(self.db.get_task_comments_page, "task_id", 2, "1000:1")
+        self.assertIn("USING INDEX idx_comments_task_id", plans[0])
+        self.assertFalse(any("TEMP B-TREE" in plan for plan in plans))
+
+    def test_search_ranks_tasks_and_comments(self):
+        self.db.add_user("member", "password", "member@example.com")
+        self.db.add_user("outsider", "password", "outsider@example.com")
+        member = self.db.get_user_by_username("member")
+        outsider = self.db.get_user_by_username("outsider")
+        self.db.add_project("project_id", "Project 1", 99, [member.get_id()])
+        self.db.add_task(Task(task_id="t1", project_id="project_id", title="Deploy database", description="Move to the new cluster", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="HIGH", status="BACKLOG", assignees=[]))
+        self.db.add_task(Task(task_id="t2", project_id="project_id", title="Write docs", description="Explain setup", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="LOW", status="BACKLOG", assignees=[]))
+        self.db.add_comment("t2", member.get_id(), "The database docs are outdated")
+
+        hits = self.db.search(member.get_id(), "datab")
+        self.assertEqual(sorted((hit.get_kind(), hit.get_task_id()) for hit in hits), [("comment", "t2"), ("task", "t1")])
+        self.assertEqual(self.db.search(outsider.get_id(), "database"), [])
+        self.assertEqual(self.db.search(member.get_id(), '" OR *'), [])
+
+        self.db.conn.execute("UPDATE tasks SET title = 'Deploy cache' WHERE id = 't1'")
+        self.assertEqual([hit.get_task_id() for hit in self.db.search(member.get_id(), "database")], ["t2"])
+
+    def test_search_filters_projects_inside_the_full_text_query(self):
+        self.db.add_project("mine", "Mine", 1, [])
+        self.db.add_project("other", "Other", 2, [])
+        for i in range(30):
+            project_id = "mine" if i % 10 == 0 else "other"
+            self.db.add_task(Task(task_id=f"t{i}", project_id=project_id, title=f"Database task {i}", description="", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="LOW", status="BACKLOG", assignees=[]))
+            self.db.add_comment(f"t{i}", "user1", "database comment")
+
+        hits = self.db.search(1, "database", limit=5)
+        self.assertEqual({hit.get_project_id() for hit in hits}, {"mine"})
+        self.assertEqual(len(hits), 5)
+        self.assertFalse(any("p6d696e65" in hit.get_snippet() for hit in hits))
+        # Permission checks must not run after ranking: the ranked statement never touches membership tables
+        plans = self._query_plans(self.db.search, 1, "database")
+        ranked = [plan for plan in plans if "VIRTUAL TABLE" in plan]
+        self.assertEqual(len(ranked), 2)
+        self.assertFalse(any("project_members" in plan or "projects" in plan.split() for plan in plans[plans.index(ranked[0]):]))
+
+    def test_search_index_survives_vacuum(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        for task_id, title in [("t1", "Alpha"), ("t2", "Bravo"), ("t3", "Charlie")]:
+            self.db.add_task(Task(task_id=task_id, project_id="project_id", title=title, description="", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="LOW", status="BACKLOG", assignees=[]))
+        self.db.conn.execute("DELETE FROM tasks WHERE id = 't1'")
+        self.db.conn.commit()
+        self.db.conn.execute("VACUUM")
+        self.assertEqual([hit.get_task_id() for hit in self.db.search(1, "charlie")], ["t3"])
+        self.assertEqual([hit.get_task_id() for hit in self.db.search(1, "bravo")], ["t2"])
+
     def test_hash_password(self):
         password = "password123"
         hashed_password = self.db._hash_password(password)
         expected_hash = hashlib.sha256(password.encode()).hexdigest()
         self.assertEqual(hashed_password, expected_hash)
 
+    def test_verify_credentials_rehashes_legacy_passwords(self):
+        self.db.conn.execute("INSERT INTO users (username, password, email) VALUES (?, ?, ?)", ("legacy", self.db._hash_password("secret"), "legacy@example.com"))
+        self.assertIsNone(self.db.verify_credentials("legacy", "wrong"))
+        self.assertIsNotNone(self.db.verify_credentials("legacy", "secret"))
+        stored = self.db.conn.execute("SELECT password FROM users WHERE username = 'legacy'").fetchone()[0]
+        self.assertTrue(stored.startswith("pbkdf2_sha256$1000$"))
+        self.assertIsNotNone(self.db.verify_credentials("legacy", "secret"))
+        self.assertIsNone(self.db.verify_credentials("missing", "secret"))
+
+    def test_verify_credentials_rejects_malformed_hashes(self):
+        digest = "ab" * 32
+        for encoded in ("foo$bar", "pbkdf2_sha256$many$00$00", "pbkdf2_sha256$1000$zz$00", f"pbkdf2_sha256$0$00${digest}", f"pbkdf2_sha256$-1$00${digest}", f"pbkdf2_sha256${2 ** 64}$00${digest}"):
+            self.db.conn.execute("DELETE FROM users")
+            self.db.conn.execute("INSERT INTO users (username, password, email) VALUES (?, ?, ?)", ("broken", encoded, "broken@example.com"))
+            self.assertIsNone(self.db.verify_credentials("broken", "secret"))
+            self.assertTrue(self.db.password_hasher.needs_rehash(encoded))
+
+    def test_password_hasher_runs_in_process_pool(self):
+        hasher = PasswordHasher(Pbkdf2Hasher(iterations=1000), max_workers=1)
+        try:
+            encoded = hasher.hash("secret")
+            self.assertTrue(hasher.verify("secret", encoded))
+            self.assertFalse(hasher.verify("wrong", encoded))
+            self.assertTrue(PasswordHasher(Pbkdf2Hasher(iterations=2000)).needs_rehash(encoded))
+        finally:
+            hasher.close()
+
+    def test_password_hasher_starts_one_pool_across_threads(self):
+        hasher = PasswordHasher(Pbkdf2Hasher(iterations=1000), max_workers=1)
+        executors = []
+        threads = [threading.Thread(target=lambda: executors.append(hasher._get_executor())) for _ in range(8)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len({id(executor) for executor in executors}), 1)
+        finally:
+            hasher.close()
+
+    def test_bulk_import_reports_row_errors(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        users_file = os.path.join(directory, "users.csv")
+        with open(users_file, "w", newline="") as file:
+            file.write("username,password,email,is_admin\nalice,secret,alice@example.com,no\nbob,secret,bob@example.com,\nalice,secret,other@example.com,\n")
+        report = self.db.bulk_import("users", read_records(users_file), batch_size=2)
+        self.assertEqual((report.imported, report.failed), (2, 1))
+        self.assertEqual(report.errors[0][0], 4)
+        self.assertIsNotNone(self.db.verify_credentials("bob", "secret"))
+
+        self.db.bulk_import("projects", [(1, {"id": "p1", "project_name": "Project 1", "leader": "alice", "members": ["bob"]})])
+        self.assertEqual(self.db.get_project_member_ids("p1"), [2])
+
+        tasks_file = os.path.join(directory, "tasks.jsonl")
+        with open(tasks_file, "w") as file:
+            file.write('{"id": "t1", "project_id": "p1", "title": "Task 1", "priority": "high", "status": "TODO", "assignees": "alice;bob"}\n')
+            file.write('{"id": "t2", "project_id": "p1", "title": "Task 2", "priority": "URGENT"}\n')
+            file.write('{"id": "t3", "project_id": "missing", "title": "Task 3"}\n')
+            file.write('not json\n')
+            file.write('{"id": "t4", "project_id": "p1", "title": "Task 4", "end_datetime": "2024-06-01T12:00:00", "start_datetime": "2024-05-31T12:00:00"}\n')
+        report = self.db.bulk_import("tasks", read_records(tasks_file))
+        self.assertEqual(report.imported, 2)
+        self.assertEqual([line_number for line_number, _ in report.errors], [2, 3, 4])
+        self.assertIn("invalid priority 'URGENT'", report.errors[0][1])
+        task = self.db.get_task("t1")
+        self.assertEqual((task.get_priority(), task.get_status(), sorted(task.get_assignees())), (Priority.HIGH, Status.TODO, [1, 2]))
+        self.assertEqual(self.db.get_task("t4").get_end_datetime(), datetime(2024, 6, 1, 12))
+
+    def test_bulk_import_normalises_offsets_and_checks_password_hashes(self):
+        report = self.db.bulk_import("users", [
+            (2, {"username": "alice", "email": "alice@example.com", "password_hash": "foo$bar"}),
+            (3, {"username": "bob", "email": "bob@example.com", "password_hash": self.db.password_hasher.hash("secret")}),
+        ])
+        self.assertEqual((report.imported, [line_number for line_number, _ in report.errors]), (1, [2]))
+
+        bad_hashes = [
+            "hunter2",
+            "ab" * 31,
+            "AB" * 32,
+            "pbkdf2_sha256$0$00$" + "ab" * 32,
+            "pbkdf2_sha256$-5$00$" + "ab" * 32,
+            "pbkdf2_sha256$99999999999$00$" + "ab" * 32,
+            "pbkdf2_sha256$1000$$" + "ab" * 32,
+            "pbkdf2_sha256$1000$0$" + "ab" * 32,
+            "pbkdf2_sha256$1000$00$ab",
+            "md5$1000$00$" + "ab" * 32,
+        ]
+        report = self.db.bulk_import("users", [(i, {"username": f"bad{i}", "email": f"bad{i}@example.com", "password_hash": encoded}) for i, encoded in enumerate(bad_hashes)])
+        self.assertEqual((report.imported, report.failed), (0, len(bad_hashes)))
+        report = self.db.bulk_import("users", [(1, {"username": "carol", "email": "carol@example.com", "password_hash": self.db._hash_password("secret")})])
+        self.assertEqual(report.imported, 1)
+        self.assertIsNotNone(self.db.verify_credentials("bob", "secret"))
+
+        self.db.add_project("p1", "Project 1", 1, [])
+        report = self.db.bulk_import("tasks", [
+            (2, {"id": "t1", "project_id": "p1", "title": "Task 1", "start_datetime": "2024-05-31T12:00:00Z", "end_datetime": "2024-06-01T12:00:00+00:00"}),
+            (3, {"id": "t2", "project_id": "p1", "title": "Task 2", "start_datetime": "2024-05-31T12:00:00+02:00"}),
+        ])
+        self.assertEqual((report.imported, report.failed), (2, 0))
+        task = self.db.get_task("t1")
+        self.assertEqual(task.get_start_datetime(), datetime(2024, 5, 31, 12, tzinfo=timezone.utc).astimezone().replace(tzinfo=None))
+        self.assertEqual(task.get_end_datetime() - task.get_start_datetime(), timedelta(days=1))
+
+    def test_export_streams_tasks_with_comments_and_history(self):
+        self.db.add_user("user1", "password", "user1@example.com")
+        self.db.add_user("user2", "password", "user2@example.com")
+        self.db.add_project("p1", "Project 1", 1, [2])
+        self.db.add_project("p2", "Project 2", 2, [])
+        for task_id, project_id in [("a", "p1"), ("b", "p1"), ("c", "p2")]:
+            self.db.add_task(Task(task_id=task_id, project_id=project_id, title=f"Task {task_id}", description="", start_datetime=datetime(2024, 5, 31), end_datetime=datetime(2024, 6, 1), priority="HIGH", status="TODO", assignees=[2]))
+        self.db.add_comment("b", "user1", "first")
+        self.db.add_comment("b", "user2", "second")
+        self.db.add_task_history("a", "Created", "user1")
+        self.db.add_task_history("c", "Created", "user2")
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "export.jsonl.gz")
+        self.assertEqual(export(self.db, path, project_id="p1", compress=True), 5)
+        with gzip.open(path) as file:
+            records = [orjson.loads(line) for line in file]
+        self.assertEqual([record["type"] for record in records], ["user", "user", "project", "task", "task"])
+        self.assertEqual(records[1]["projects"], ["p1"])
+        self.assertEqual(records[2]["members"], [2])
+        self.assertEqual([entry["action"] for entry in records[3]["history"]], ["Created"])
+        self.assertEqual([comment["content"] for comment in records[4]["comments"]], ["first", "second"])
+        self.assertEqual(records[4]["assignees"], [2])
+
+        self.db.change_status("c", "ARCHIVED")
+        self.assertEqual(self.db.archive_tasks(datetime(2025, 1, 1)), 1)
+        path = os.path.join(directory, "export.json")
+        self.assertEqual(export(self.db, path, fmt="json"), 7)
+        with open(path, "rb") as file:
+            records = orjson.loads(file.read())
+        self.assertEqual(sorted(records[1]["projects"]), ["p1", "p2"])
+        self.assertEqual([(record["task_id"], record["archived"]) for record in records[4:]], [("a", False), ("b", False), ("c", True)])
+        self.assertEqual([entry["action"] for entry in records[6]["history"]], ["Created"])
+
+        # A task copied to the archive but not yet deleted from main is exported once, as live
+        for table, task_column, columns, archive_columns, _ in ARCHIVED_TABLES:
+            self.db.conn.execute(f"INSERT INTO archive.{table} ({archive_columns}) SELECT {columns} FROM main.{table} WHERE {task_column} = 'b'")
+        self.db.conn.commit()
+        self.assertEqual(export(self.db, path, fmt="json"), 7)
+        with open(path, "rb") as file:
+            records = orjson.loads(file.read())
+        self.assertEqual([(record["task_id"], record["archived"]) for record in records[4:]], [("a", False), ("b", False), ("c", True)])
+        self.assertEqual([comment["content"] for comment in records[5]["comments"]], ["first", "second"])
+
+    def test_backup_copies_live_database(self):
+        self.db.add_user("user1", "password", "user1@example.com")
+        self.db.enable_write_behind(max_batch=1000, max_delay=60)
+        self.db.add_task_history("task_id", "Created", "user1")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        destination = self.db.backup(os.path.join(directory, "backup.db"), pages=1)
+        self.assertEqual(sorted(os.listdir(directory)), ["backup-archive.db", "backup.db"])
+        copy = sqlite3.connect(destination)
+        self.assertEqual(copy.execute("SELECT COUNT(*) FROM task_history").fetchone()[0], 1)
+        self.assertEqual(copy.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+        copy.close()
+        copy = sqlite3.connect(os.path.join(directory, "backup-archive.db"))
+        self.assertEqual(copy.execute("SELECT COUNT(*) FROM tasks").fetchone()[0], 0)
+        copy.close()
+
+        scheduler = BackupScheduler(self.db, directory, interval=3600, keep=2)
+        for _ in range(3):
+            scheduler.backup_now()
+        scheduler.close()
+        self.assertEqual(len([name for name in os.listdir(directory) if name.startswith("test_database-")]), 4)
+
+    def test_archive_tasks_moves_dependents_and_keeps_get_task(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        old = datetime(2024, 1, 1)
+        for task_id, status, end in [("t1", "ARCHIVED", old), ("t2", "ARCHIVED", old), ("t3", "ARCHIVED", datetime.now()), ("t4", "DONE", old)]:
+            self.db.add_task(Task(task_id=task_id, project_id="project_id", title=task_id, description="", start_datetime=old, end_datetime=end, priority="LOW", status=status, assignees=[1]))
+            self.db.add_comment(task_id, "user1", f"comment on {task_id}")
+            self.db.add_task_history(task_id, "Created", "user1")
+
+        self.assertEqual(self.db.archive_tasks(datetime(2024, 6, 1), batch_size=1), 2)
+        self.assertEqual(sorted(task.get_task_id() for task in self.db.get_project_tasks("project_id")), ["t3", "t4"])
+        for table in ("task_assignees", "comments", "task_history"):
+            self.assertEqual(self.db.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], 2)
+        self.assertEqual(self.db.get_project_counters("project_id")["status"][Status.ARCHIVED], 1)
+
+        task = self.db.get_task("t1")
+        self.assertEqual((task.get_status(), task.get_assignees()), (Status.ARCHIVED, [1]))
+        self.assertEqual([comment.get_content() for comment in task.comments], ["comment on t1"])
+        self.assertEqual([entry.get_action() for entry in task.history], ["Created"])
+        self.assertIsNone(self.db.get_task("missing"))
+        self.assertTrue(self.db.is_archived("t1"))
+        self.assertFalse(self.db.is_archived("t3"))
+        self.assertEqual(self.db.archive_tasks(datetime(2024, 6, 1)), 0)
+        archived = self.db.get_archived_project_tasks("project_id")
+        self.assertEqual(sorted((task.get_task_id(), tuple(task.get_assignees())) for task in archived), [("t1", (1,)), ("t2", (1,))])
+        self.assertEqual(self.db.get_archived_project_tasks("other"), [])
+
+    def test_archive_tasks_twice_keeps_earlier_comments_and_history(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        old = datetime(2024, 1, 1)
+        for task_id in ("t1", "t2"):
+            self.db.add_task(Task(task_id=task_id, project_id="project_id", title=task_id, description="", start_datetime=old, end_datetime=old, priority="LOW", status="ARCHIVED", assignees=[]))
+        self.db.add_comment("t1", "user1", "comment on t1")
+        self.db.add_task_history("t1", "Created", "user1")
+        self.db.conn.execute("UPDATE tasks SET status = 'DONE' WHERE id = 't2'")
+        self.db.conn.commit()
+        self.assertEqual(self.db.archive_tasks(datetime(2024, 6, 1)), 1)
+
+        self.db.add_comment("t2", "user1", "comment on t2")
+        self.db.add_task_history("t2", "Created", "user1")
+        self.db.conn.execute("UPDATE tasks SET status = 'ARCHIVED' WHERE id = 't2'")
+        self.db.conn.commit()
+        self.assertEqual(self.db.archive_tasks(datetime(2024, 6, 1)), 1)
+
+        for task_id in ("t1", "t2"):
+            task = self.db.get_task(task_id)
+            self.assertEqual([comment.get_content() for comment in task.comments], [f"comment on {task_id}"])
+            self.assertEqual([entry.get_action() for entry in task.history], ["Created"])
+
+    def test_migrate_upgrades_existing_archive(self):
+        archive_file = self.db.archive_file
+        self.db.close()
+        for path in (self.DB_FILE, archive_file):
+            os.remove(path)
+        conn = sqlite3.connect(archive_file)
+        conn.execute("CREATE TABLE comments (id INTEGER PRIMARY KEY, task_id TEXT NOT NULL, username TEXT NOT NULL, content TEXT NOT NULL, timestamp INTEGER NOT NULL)")
+        conn.execute("INSERT INTO comments VALUES (5, 't1', 'user1', 'archived comment', 1000)")
+        conn.commit()
+        conn.close()
+
+        self.db = Database(self.DB_FILE, password_hasher=fast_hasher())
+        self.assertEqual(self.db.conn.execute("SELECT source_id, task_id FROM archive.comments").fetchall(), [(5, "t1")])
+        self.db.add_comment("t2", "user1", "new comment")
+        self.assertEqual(self.db.conn.execute("SELECT id FROM comments").fetchall(), [(6,)])
+
+    def test_archive_tasks_keeps_tasks_changed_after_the_copy(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        old = datetime(2024, 1, 1)
+        self.db.add_task(Task(task_id="t1", project_id="project_id", title="t1", description="", start_datetime=old, end_datetime=old, priority="LOW", status="ARCHIVED", assignees=[]))
+        # A copy left behind by an interrupted run that no longer matches the live row
+        self.db.conn.execute("INSERT INTO archive.tasks SELECT id, project_id, 'stale', description, start_datetime, end_datetime, priority, status FROM tasks")
+        self.db.conn.commit()
+
+        self.assertEqual(self.db.archive_tasks(datetime(2024, 6, 1)), 0)
+        self.assertEqual(self.db.get_task("t1").get_title(), "t1")
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM archive.tasks").fetchone()[0], 0)
+        self.assertEqual(self.db.archive_tasks(datetime(2024, 6, 1)), 1)
+        self.assertEqual(self.db.get_archived_task("t1").get_title(), "t1")
+
+    def test_remove_project_members_unassigns_in_one_pass(self):
+        for name in ("leader", "user1", "user2"):
+            self.db.add_user(name, "password", f"{name}@example.com")
+        self.db.add_project("project_id", "Project 1", 1, [2, 3])
+        self.db.add_project("other_id", "Project 2", 1, [2])
+        for task_id, project_id, assignees in [("t1", "project_id", [2, 3]), ("t2", "project_id", [3]), ("t3", "project_id", []), ("t4", "other_id", [2])]:
+            self.db.add_task(Task(task_id=task_id, project_id=project_id, title=task_id, description="", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="LOW", status="TODO", assignees=assignees))
+
+        self.assertEqual(self.db.remove_project_members("project_id", [2, 3], "leader"), 3)
+        self.assertEqual(self.db.get_project_member_ids("project_id"), [])
+        self.assertEqual(self.db.get_task_assignees("t1"), [])
+        self.assertEqual(self.db.get_task_assignees("t4"), [2])
+        self.assertEqual(sorted(entry.get_action() for entry in self.db.get_task_history("t1")), ["Unassigned user user1 due to removal from project", "Unassigned user user2 due to removal from project"])
+        self.assertEqual(self.db.get_task_history("t3"), [])
+        self.assertEqual([project.get_project_id() for project in self.db.get_user_by_id(2).get_projects()], ["other_id"])
+
+    def test_get_addable_users(self):
+        for name in ("leader", "member", "bob", "bobby", "b_x", "carol"):
+            self.db.add_user(name, "password", f"{name}@example.com")
+        self.db.add_user("bobcat", "password", "bobcat@example.com", active=0)
+        self.db.add_project("project_id", "Project 1", 1, [2])
+
+        names = lambda users: [user.get_username() for user in users]
+        self.assertEqual(names(self.db.get_addable_users("project_id")), ["b_x", "bob", "bobby", "carol"])
+        self.assertEqual(names(self.db.get_addable_users("project_id", limit=2, offset=1)), ["bob", "bobby"])
+        self.assertEqual(names(self.db.get_addable_users("project_id", prefix="BOB")), ["bob", "bobby"])
+        self.assertEqual(names(self.db.get_addable_users("project_id", prefix="b_")), ["b_x"])
+        self.assertEqual(names(self.db.get_addable_users("project_id", prefix="CAROL@")), ["carol"])
+
+        statements = []
+        self.db.conn.set_trace_callback(statements.append)
+        self.db.get_addable_users("project_id", prefix="b")
+        self.db.conn.set_trace_callback(None)
+        self.assertEqual(len(statements), 1)
+
+    def test_search_users_uses_nocase_indexes(self):
+        for name in ("Alice", "alfred", "bob"):
+            self.db.add_user(name, "password", f"{name.lower()}@example.com")
+        self.db.add_user("alma", "password", "zed@example.com", active=0)
+        self.db.add_user("zed", "password", "ALBERT@example.com")
+
+        names = lambda users: [user.get_username() for user in users]
+        self.assertEqual(names(self.db.search_users("al")), ["alfred", "Alice", "zed"])
+        self.assertEqual(names(self.db.search_users("AL", limit=1, offset=1)), ["Alice"])
+        self.assertEqual(names(self.db.search_users("al", exclude_ids=[1])), ["alfred", "zed"])
+        self.assertEqual(names(self.db.search_users()), ["alfred", "Alice", "bob", "zed"])
+
+        self.db.add_project("project_id", "Project 1", 1, [2, 3])
+        self.db.add_task(Task(task_id="t1", project_id="project_id", title="Task 1", description="", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="LOW", status="TODO", assignees=[3]))
+        self.assertEqual(names(self.db.get_assignable_users("t1")), ["alfred", "Alice"])
+        self.assertEqual(names(self.db.get_assignable_users("t1", prefix="ali")), ["Alice"])
+
+        plans = self._query_plans(self.db.search_users, "al")
+        self.assertTrue(any("idx_users_username_nocase" in plan for plan in plans))
+        self.assertTrue(any("idx_users_email_nocase" in plan for plan in plans))
+
+    def test_bulk_task_operations(self):
+        for name in ("leader", "user1", "user2"):
+            self.db.add_user(name, "password", f"{name}@example.com")
+        self.db.add_project("project_id", "Project 1", 1, [2, 3])
+        for task_id, status, assignees in [("t1", "TODO", [2]), ("t2", "DONE", []), ("t3", "TODO", [])]:
+            self.db.add_task(Task(task_id=task_id, project_id="project_id", title=task_id, description="", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="LOW", status=status, assignees=assignees))
+
+        statements = []
+        self.db.conn.set_trace_callback(statements.append)
+        self.assertEqual(self.db.bulk_change_status(["t1", "t2", "t3", "missing"], Status.DONE, "leader"), 2)
+        self.db.conn.set_trace_callback(None)
+        self.assertEqual(statements.count("COMMIT"), 1)
+        self.assertEqual(self.db.get_project_counters("project_id")["status"][Status.DONE], 3)
+        self.assertEqual([entry.get_action() for entry in self.db.get_task_history("t1")], ["Changed status from TODO to DONE"])
+        self.assertEqual(self.db.get_task_history("t2"), [])
+
+        self.assertEqual(self.db.bulk_change_priority(["t1", "t2"], "CRITICAL", "leader"), 2)
+        self.assertEqual(self.db.get_task("t2").get_priority(), Priority.CRITICAL)
+
+        self.assertEqual(self.db.bulk_assign(["t1", "t2", "t3"], [2, 3], "leader"), 5)
+        self.assertEqual(sorted(self.db.get_task_assignees("t1")), [2, 3])
+        self.assertEqual([entry.get_action() for entry in self.db.get_task_history("t1")][-1], "Assigned user user2")
+        self.assertEqual(self.db.bulk_assign(["t1"], [2], "leader"), 0)
+
     def test_add_admin(self):
         self.db.add_admin("admin_user", "admin_password")
         cursor = self.db.conn.cursor()
@@ -143,6 +563,19 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(user.email, "test_user@example.com")
         self.assertEqual(len(user.projects), 1)
 
+    def test_get_user_by_username_loads_projects_lazily(self):
+        self.db.add_user("user1", "password", "user1@example.com")
+        self.db.add_project("led_id", "Led", 1, [1])
+        self.db.add_project("member_id", "Member", 2, [1])
+        statements = []
+        self.db.conn.set_trace_callback(statements.append)
+        user = self.db.get_user_by_username("user1")
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(sorted(project.get_project_id() for project in user.get_projects()), ["led_id", "member_id"])
+        self.assertEqual(len(statements), 2)
+        self.db.conn.set_trace_callback(None)
+        self.assertIs(self.db.get_user_by_id(1), user)
+
     def test_get_all_users(self):
         self.db.add_user("test_user1", "password", "test_user1@example.com")
         self.db.add_user("test_user2", "password", "test_user2@example.com")
@@ -209,6 +642,18 @@ class TestDatabase(unittest.TestCase):
         self.assertIsNotNone(retrieved_user)
         self.assertEqual(retrieved_user.username, "test_user")
 
+    def test_get_users_by_ids(self):
+        self.db.add_user("user1", "password", "user1@example.com")
+        self.db.add_user("user2", "password", "user2@example.com")
+        self.db.add_user("user3", "password", "user3@example.com")
+        user1 = self.db.get_user("user1", "password")
+        user3 = self.db.get_user("user3", "password")
+        users = self.db.get_users_by_ids([user1[0], user3[0], user1[0], 999])
+        self.assertEqual(set(users), {user1[0], user3[0]})
+        self.assertEqual(users[user1[0]].get_username(), "user1")
+        self.assertEqual(users[user3[0]].get_username(), "user3")
+        self.assertEqual(self.db.get_users_by_ids([]), {})
+
     def test_get_project_members(self):
         self.db.add_user("user1", "password", "user1@example.com")
         self.db.add_user("user2", "password", "user2@example.com")
@@ -229,6 +674,26 @@ class TestDatabase(unittest.TestCase):
         user_id = self.db.get_current_user_id(page)
         self.assertEqual(user_id, 1)
 
+    def test_principal_is_cached_in_session_until_invalidated(self):
+        self.db.add_user("test_user", "password", "test_user@example.com")
+        self.db.add_project("project_id", "Project 1", 2, [])
+        page = MockPage(session={"username": "test_user"})
+        principal = self.db.get_principal(page)
+        self.assertEqual(principal.get_user_id(), 1)
+        self.assertFalse(principal.is_member_of("project_id"))
+
+        statements = []
+        self.db.conn.set_trace_callback(statements.append)
+        self.assertEqual(self.db.get_current_user_id(page), 1)
+        self.assertIs(self.db.get_principal(page), principal)
+        self.db.conn.set_trace_callback(None)
+        self.assertEqual(statements, [])
+
+        self.db.add_project_member("project_id", 1)
+        self.assertTrue(self.db.get_principal(page).is_member_of("project_id"))
+        self.db.inactivate_user(1)
+        self.assertFalse(self.db.get_principal(page).get_is_active())
+
     def test_get_current_user_username(self):
         self.db.add_user("test_user", "password", "test_user@example.com")
         page = MockPage(session={"username": "test_user"})
@@ -278,6 +743,25 @@ class TestDatabase(unittest.TestCase):
         project_tasks = self.db.get_project_tasks("project_id")
         self.assertEqual(len(project_tasks), 0)
 
+    def test_get_project_tasks_loads_assignees_in_one_pass(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        for i in range(5):
+            task = Task(task_id=f"task_{i}", project_id="project_id", title=f"Task {i}", description="Description", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="HIGH", status="BACKLOG", assignees=[1, i + 2])
+            self.db.add_task(task)
+        other_task = Task(task_id="other", project_id="other_project", title="Other", description="Description", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="LOW", status="BACKLOG", assignees=[1])
+        self.db.add_task(other_task)
+
+        statements = []
+        self.db.conn.set_trace_callback(statements.append)
+        project_tasks = self.db.get_project_tasks("project_id")
+        self.db.conn.set_trace_callback(None)
+
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(len(project_tasks), 5)
+        for task in project_tasks:
+            i = int(task.get_task_id().split("_")[1])
+            self.assertEqual(sorted(task.get_assignees()), [1, i + 2])
+
     def test_get_task(self):
         self.db.add_user("user1", "password", "user1@example.com")
         user = self.db.get_user("user1", "password")
@@ -361,9 +845,374 @@ class TestDatabase(unittest.TestCase):
 
 
 
+    def test_migrate_sets_schema_version(self):
+        self.assertEqual(self.db.get_schema_version(), len(MIGRATIONS))
+        indexes = [row[0] for row in self.db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()]
+        self.assertIn("idx_tasks_project_id", indexes)
+        self.assertIn("idx_task_history_task_id", indexes)
+
+    def test_migrate_upgrades_existing_database(self):
+        self.db.close()
+        os.remove(self.DB_FILE)
+        conn = sqlite3.connect(self.DB_FILE)
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, project_id TEXT NOT NULL, title TEXT NOT NULL, description TEXT, start_datetime TEXT NOT NULL, end_datetime TEXT NOT NULL, priority TEXT NOT NULL, status TEXT NOT NULL)")
+        conn.execute("INSERT INTO tasks VALUES ('task_id', 'project_id', 'Task 1', '', '2024-05-31 12:00:00.000000', '2024-06-01 12:00:00.000000', 'HIGH', 'TODO')")
+        conn.commit()
+        conn.close()
+
+        self.db = Database(self.DB_FILE, password_hasher=fast_hasher())
+        self.assertEqual(self.db.get_schema_version(), len(MIGRATIONS))
+        self.assertEqual(self.db.get_project_tasks("project_id")[0].get_title(), "Task 1")
+        self.assertEqual(self.db.get_project_counters("project_id")["status"][Status.TODO], 1)
+        self.assertEqual(self.db.conn.execute("SELECT title FROM tasks_fts WHERE tasks_fts MATCH 'task'").fetchall(), [("Task 1",)])
+
+    def test_migrate_converts_text_timestamps(self):
+        self.db.close()
+        os.remove(self.DB_FILE)
+        conn = sqlite3.connect(self.DB_FILE)
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, project_id TEXT NOT NULL, title TEXT NOT NULL, description TEXT, start_datetime TEXT NOT NULL, end_datetime TEXT NOT NULL, priority TEXT NOT NULL, status TEXT NOT NULL)")
+        conn.execute("CREATE TABLE comments (id INTEGER PRIMARY KEY, task_id TEXT NOT NULL, username TEXT NOT NULL, content TEXT NOT NULL, timestamp TEXT NOT NULL)")
+        conn.execute("CREATE TABLE task_history (id INTEGER PRIMARY KEY, task_id TEXT NOT NULL, action TEXT NOT NULL, timestamp TEXT NOT NULL, author TEXT NOT NULL)")
+        conn.execute("INSERT INTO tasks VALUES ('task_id', 'project_id', 'Task 1', '', '2024-05-31 12:00:00.250000', '2024-06-01 12:00:00.000000', 'HIGH', 'TODO')")
+        conn.execute("INSERT INTO comments (task_id, username, content, timestamp) VALUES ('task_id', 'user1', 'comment', '2024-05-31T13:00:00.500000')")
+        conn.execute("INSERT INTO task_history (task_id, action, timestamp, author) VALUES ('task_id', 'Updated', '2024-05-31T14:00:00', 'user1')")
+        conn.execute("INSERT INTO task_history (task_id, action, timestamp, author) VALUES ('task_id', 'Created', '2024-05-31T12:00:00.250000', 'user1')")
+        conn.commit()
+        conn.close()
+
+        self.db = Database(self.DB_FILE, password_hasher=fast_hasher())
+        task = self.db.get_task("task_id")
+        self.assertEqual(task.get_start_datetime(), datetime(2024, 5, 31, 12, 0, 0, 250000))
+        self.assertEqual(task.get_end_datetime(), datetime(2024, 6, 1, 12))
+        self.assertEqual(self.db.get_task_comments("task_id")[0].get_timestamp(), datetime(2024, 5, 31, 13, 0, 0, 500000))
+        self.assertEqual([entry.get_action() for entry in self.db.get_task_history("task_id")], ["Created", "Updated"])
+        types = self.db.conn.execute("SELECT typeof(start_datetime), typeof(end_datetime) FROM tasks").fetchone()
+        self.assertEqual(types, ("integer", "integer"))
+
+    def test_timestamps_round_trip(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        start = datetime(2024, 5, 31, 12, 30, 15, 123456)
+        task = Task(task_id="task_id", project_id="project_id", title="Task 1", description="Description", start_datetime=start, end_datetime=start + timedelta(days=1), priority="HIGH", status="BACKLOG", assignees=[])
+        self.db.add_task(task)
+        stored = self.db.get_task("task_id")
+        self.assertEqual(stored.get_start_datetime(), start)
+        self.assertEqual(stored.get_end_datetime(), start + timedelta(days=1))
+
+        self.db.add_comment("task_id", "user1", "comment")
+        comment = self.db.get_task_comments("task_id")[0]
+        self.assertIsInstance(comment.get_timestamp(), datetime)
+        self.assertIsNotNone(self.db.get_comment("task_id", "user1", "comment", comment.get_timestamp()))
+        self.db.delete_comment("task_id", "user1", "comment", comment.get_timestamp())
+        self.assertEqual(self.db.get_task_comments("task_id"), [])
+
+    def test_connections_are_per_thread_and_use_wal(self):
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(self.db.conn))
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], self.db.conn)
+        self.assertEqual(self.db.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_readers_proceed_while_writer_commits(self):
+        self.db.add_comment("task_id", "user1", "first")
+        writing = threading.Event()
+        done = threading.Event()
+
+        def write():
+            self.db.conn.execute("BEGIN IMMEDIATE")
+            self.db.conn.execute("INSERT INTO comments (task_id, username, content, timestamp) VALUES ('task_id', 'user1', 'second', '2024-05-31 12:00:00')")
+            writing.set()
+            done.wait(5)
+            self.db.conn.commit()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        writing.wait(5)
+        comments = self.db.get_task_comments("task_id")
+        done.set()
+        writer.join()
+
+        self.assertEqual([comment.get_content() for comment in comments], ["first"])
+        self.assertEqual(len(self.db.get_task_comments("task_id")), 2)
+
+    def test_transaction_commits_once(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        statements = []
+        self.db.conn.set_trace_callback(statements.append)
+        with self.db.transaction():
+            task = Task(task_id="task_id", project_id="project_id", title="Task 1", description="Description", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="HIGH", status="BACKLOG", assignees=[1, 2])
+            self.db.add_task(task)
+            self.db.add_task_history("task_id", "Created", "user1")
+            self.db.add_task_history("task_id", "Assigned", "user1")
+        self.db.conn.set_trace_callback(None)
+
+        self.assertEqual([statement for statement in statements if statement == "COMMIT"], ["COMMIT"])
+        self.assertEqual(len(self.db.get_task_history("task_id")), 2)
+
+    def test_transaction_rolls_back_on_error(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                task = Task(task_id="task_id", project_id="project_id", title="Task 1", description="Description", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="HIGH", status="BACKLOG", assignees=[1])
+                self.db.add_task(task)
+                with self.db.transaction():
+                    self.db.add_task_history("task_id", "Created", "user1")
+                raise ValueError("boom")
+
+        self.assertIsNone(self.db.get_task("task_id"))
+        self.assertEqual(self.db.get_task_history("task_id"), [])
+        self.db.add_task_history("task_id", "Created", "user1")
+        self.assertEqual(len(self.db.get_task_history("task_id")), 1)
+
+    def test_write_behind_buffers_history_and_comments(self):
+        journal = self.db.enable_write_behind(max_batch=1000, max_delay=60)
+        self.db.add_task_history("task_id", "Created", "user1")
+        self.db.add_comment("task_id", "user1", "comment")
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM task_history").fetchone()[0], 0)
+        self.assertEqual(journal.pending_count(), 2)
+
+        self.assertEqual(len(self.db.get_task_history("task_id")), 1)
+        self.assertEqual(len(self.db.get_task_comments("task_id")), 1)
+        self.assertEqual(journal.pending_count(), 0)
+
+    def test_write_behind_is_bypassed_inside_transactions(self):
+        journal = self.db.enable_write_behind(max_batch=1000, max_delay=60)
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.db.add_task(Task(task_id="t1", project_id="project_id", title="Task 1", description="", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="LOW", status="BACKLOG", assignees=[]))
+                self.db.add_task_history("t1", "Created", "user1")
+                self.db.add_comment("t1", "user1", "comment")
+                raise RuntimeError("save failed")
+        self.assertEqual(journal.pending_count(), 0)
+        self.assertEqual(self.db.get_task_history("t1"), [])
+        self.assertEqual(self.db.get_task_comments("t1"), [])
+
+    def test_write_behind_flushes_on_size_threshold(self):
+        self.db.enable_write_behind(max_batch=3, max_delay=60)
+        for i in range(3):
+            self.db.add_task_history("task_id", f"Action {i}", "user1")
+        for _ in range(50):
+            if self.db.conn.execute("SELECT COUNT(*) FROM task_history").fetchone()[0] == 3:
+                break
+            threading.Event().wait(0.05)
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM task_history").fetchone()[0], 3)
+
+    def test_write_behind_flushes_on_close(self):
+        self.db.enable_write_behind(max_batch=1000, max_delay=60)
+        self.db.add_task_history("task_id", "Created", "user1")
+        self.db.close()
+        self.db = Database(self.DB_FILE, password_hasher=fast_hasher())
+        self.assertEqual(len(self.db.get_task_history("task_id")), 1)
+
+    def test_debouncer_coalesces_calls_on_one_thread(self):
+        debouncer = Debouncer("test-debouncer")
+        calls = []
+        done = threading.Event()
+        def search(prefix):
+            calls.append((prefix, threading.current_thread().name, self.db.conn))
+            if prefix == "ali":
+                done.set()
+        for prefix in ("a", "al", "ali"):
+            debouncer.schedule("picker", 0.05, search, prefix)
+        self.assertTrue(done.wait(5))
+        debouncer.schedule("picker", 0, search, "bob")
+        for _ in range(50):
+            if len(calls) == 2:
+                break
+            threading.Event().wait(0.05)
+        self.assertEqual([prefix for prefix, _, _ in calls], ["ali", "bob"])
+        self.assertEqual({name for _, name, _ in calls}, {"test-debouncer"})
+        self.assertIs(calls[0][2], calls[1][2])
+
+    def test_identity_map_returns_cached_instances(self):
+        self.db.add_user("user1", "password", "user1@example.com")
+        self.db.add_project("project_id", "Project 1", 1, [])
+        self.assertIs(self.db.get_user_by_id(1), self.db.get_user_by_id(1))
+        self.assertIs(self.db.get_project("project_id"), self.db.get_project("project_id"))
+        self.assertIs(self.db.get_users_by_ids([1])[1], self.db.get_user_by_id(1))
+        stats = self.db.cache_stats()
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["hits"], 4)
+
+    def test_identity_map_invalidated_by_mutators(self):
+        self.db.add_user("user1", "password", "user1@example.com")
+        self.db.add_project("project_id", "Project 1", 1, [])
+        self.assertTrue(self.db.get_user_by_id(1).get_is_active())
+        self.db.inactivate_user(1)
+        self.assertFalse(self.db.get_user_by_id(1).get_is_active())
+
+        self.db.add_user("user2", "password", "user2@example.com")
+        self.assertEqual(len(self.db.get_user_by_username("user2").get_projects()), 0)
+        self.db.add_project_member("project_id", 2)
+        self.assertEqual(len(self.db.get_user_by_username("user2").get_projects()), 1)
+
+    def test_identity_map_evicts_least_recently_used(self):
+        # Each user is cached under its id and its username
+        self.db.identity_map.capacity = 4
+        for i in range(3):
+            self.db.add_user(f"user{i}", "password", f"user{i}@example.com")
+        user1 = self.db.get_user_by_id(1)
+        self.db.get_user_by_id(2)
+        self.db.get_user_by_id(1)
+        self.db.get_user_by_id(3)
+        self.assertIs(self.db.get_user_by_id(1), user1)
+        self.assertIs(self.db.get_user_by_username("user0"), user1)
+        self.assertEqual(self.db.cache_stats()["size"], 4)
+
+    def test_get_project_counters(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        for i, (status, priority) in enumerate([("TODO", "HIGH"), ("TODO", "CRITICAL"), ("DOING", "HIGH")]):
+            self.db.add_task(Task(task_id=f"t{i}", project_id="project_id", title=f"Task {i}", description="", start_datetime=datetime.now(), end_datetime=datetime.now(), priority=priority, status=status, assignees=[]))
+        self.db.change_status("t0", "DONE")
+        self.db.conn.execute("DELETE FROM tasks WHERE id = 't1'")
+
+        counters = self.db.get_project_counters("project_id")
+        self.assertEqual(counters["total"], 2)
+        self.assertEqual(counters["status"][Status.DONE], 1)
+        self.assertEqual(counters["status"][Status.DOING], 1)
+        self.assertEqual(counters["status"][Status.TODO], 0)
+        self.assertEqual(counters["priority"][Priority.HIGH], 2)
+        self.assertEqual(counters["priority"][Priority.CRITICAL], 0)
+        rows = self.db.conn.execute("SELECT project_id, status, priority, count FROM project_task_counts ORDER BY status").fetchall()
+        self.assertEqual(rows, [("project_id", "DOING", "HIGH", 1), ("project_id", "DONE", "HIGH", 1)])
+
+    def test_get_project_board(self):
+        self.db.add_project("project_id", "Project 1", 1, [])
+        for i, (status, priority) in enumerate([("TODO", "LOW"), ("TODO", "CRITICAL"), ("DOING", "MEDIUM"), ("TODO", "HIGH")]):
+            self.db.add_task(Task(task_id=f"t{i}", project_id="project_id", title=f"Task {i}", description="", start_datetime=datetime.now(), end_datetime=datetime.now(), priority=priority, status=status, assignees=[1, 2] if i == 0 else []))
+        self.db.change_priority("t3", Priority.LOW)
+
+        board = self.db.get_project_board("project_id")
+        self.assertEqual([task.get_task_id() for task in board[Status.TODO]], ["t1", "t0", "t3"])
+        self.assertEqual([task.get_task_id() for task in board[Status.DOING]], ["t2"])
+        self.assertEqual(board[Status.DONE], [])
+        self.assertEqual(sorted(board[Status.TODO][1].get_assignees()), [1, 2])
+        self.assertLess(Priority.CRITICAL, Priority.LOW)
+
+        plans = self._query_plans(self.db.get_project_board, "project_id")
+        self.assertIn("USING INDEX idx_tasks_board (project_id=?)", plans[0])
+        self.assertFalse(any("TEMP B-TREE" in plan for plan in plans))
+
+    def test_get_tasks_assigned_to(self):
+        self.db.add_project("project_a", "Project A", 1, [])
+        self.db.add_project("project_b", "Project B", 1, [])
+        now = datetime.now()
+        self.db.add_task(Task(task_id="t1", project_id="project_a", title="Task 1", description="", start_datetime=now, end_datetime=now + timedelta(days=2), priority="LOW", status="TODO", assignees=[1, 2]))
+        self.db.add_task(Task(task_id="t2", project_id="project_b", title="Task 2", description="", start_datetime=now, end_datetime=now + timedelta(days=1), priority="CRITICAL", status="DOING", assignees=[1]))
+        self.db.add_task(Task(task_id="t3", project_id="project_b", title="Task 3", description="", start_datetime=now, end_datetime=now, priority="HIGH", status="DONE", assignees=[2]))
+
+        tasks = self.db.get_tasks_assigned_to(1)
+        self.assertEqual([task.get_task_id() for task in tasks], ["t2", "t1"])
+        self.assertEqual(sorted(tasks[1].get_assignees()), [1, 2])
+        self.assertEqual([task.get_task_id() for task in self.db.get_tasks_assigned_to(2, statuses=[Status.TODO])], ["t1"])
+        self.assertEqual([task.get_task_id() for task in self.db.get_tasks_assigned_to(2, order="priority")], ["t3", "t1"])
+
+        statements = []
+        self.db.conn.set_trace_callback(statements.append)
+        self.db.get_tasks_assigned_to(1, statuses=["TODO", "DOING"])
+        self.db.conn.set_trace_callback(None)
+        self.assertEqual(len(statements), 1)
+        plans = self._query_plans(self.db.get_tasks_assigned_to, 1)
+        self.assertIn("COVERING INDEX idx_task_assignees_user_id", plans[0])
+
+    def _query_plans(self, getter, *args):
+        statements = []
+        self.db.identity_map.clear()
+        self.db.conn.set_trace_callback(statements.append)
+        getter(*args)
+        self.db.conn.set_trace_callback(None)
+        plans = []
+        # Statements SQLite runs internally, such as FTS5 ranking setup, are traced as comments
+        for statement in statements:
+            if statement.startswith("--"):
+                continue
+            plans.extend(row[3] for row in self.db.conn.execute("EXPLAIN QUERY PLAN " + statement).fetchall())
+        return plans
+
+    def test_getters_use_indexes(self):
+        self.db.add_user("user1", "password", "user1@example.com")
+        self.db.add_project("project_id", "Project 1", 1, [1])
+        task = Task(task_id="task_id", project_id="project_id", title="Task 1", description="Description", start_datetime=datetime.now(), end_datetime=datetime.now(), priority="HIGH", status="BACKLOG", assignees=[1])
+        self.db.add_task(task)
+        self.db.add_comment("task_id", "user1", "comment")
+        self.db.add_task_history("task_id", "Created", "user1")
+
+        getters = [
+            (self.db.get_project_tasks, "project_id"),
+            (self.db.get_task, "task_id"),
+            (self.db.get_task_assignees, "task_id"),
+            (self.db.get_task_comments, "task_id"),
+            (self.db.get_task_history, "task_id"),
+            (self.db.get_project, "project_id"),
+            (self.db.get_project_member_ids, "project_id"),
+            (self.db.get_project_members, "project_id"),
+            (self.db.get_user_by_id, 1),
+            (self.db.get_users_by_ids, [1]),
+            (self.db.get_user_by_username, "user1"),
+            (self.db.get_user_project_member, 1),
+            (self.db.get_user_project_leader, 1),
+        ]
+        for getter, arg in getters:
+            plans = self._query_plans(getter, arg)
+            self.assertTrue(plans, getter.__name__)
+            for plan in plans:
+                self.assertFalse(plan.startswith("SCAN"), f"{getter.__name__}: {plan}")
+
+        plans = [row[3] for row in self.db.conn.execute("EXPLAIN QUERY PLAN SELECT task_id FROM task_assignees WHERE user_id = ?", (1,)).fetchall()]
+        self.assertIn("idx_task_assignees_user_id", plans[0])
+
+
+
+class TestAsyncDatabase(unittest.TestCase):
+    DB_FILE = 'test_async_database.db'
+
+    def setUp(self):
+        if os.path.exists(self.DB_FILE):
+            os.remove(self.DB_FILE)
+        self.db = Database(self.DB_FILE, password_hasher=fast_hasher())
+        self.async_db = AsyncDatabase(self.db)
+
+    def tearDown(self):
+        self.async_db.close()
+        self.db.close()
+        for path in (self.DB_FILE, self.DB_FILE + "-wal", self.DB_FILE + "-shm", self.db.archive_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_methods_run_on_executor(self):
+        async def scenario():
+            await self.async_db.add_user("user1", "password", "user1@example.com")
+            user = await self.async_db.get_user_by_username("user1")
+            thread_name = await self.async_db.run(lambda: threading.current_thread().name)
+            return user, thread_name
+
+        user, thread_name = asyncio.run(scenario())
+        self.assertEqual(user.get_username(), "user1")
+        self.assertTrue(thread_name.startswith("trellomize-db"))
+
+    def test_run_in_transaction(self):
+        def create_project(db):
+            db.add_project("project_id", "Project 1", 1, [])
+            db.add_task_history("task_id", "Created", "user1")
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.async_db.run_in_transaction(create_project))
+        self.assertIsNone(self.db.get_project("project_id"))
+
+    def test_connection_is_not_exposed(self):
+        with self.assertRaises(AttributeError):
+            self.async_db.conn
+
+
+class MockSession(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
 class MockPage:
     def __init__(self, session=None):
-        self.session = session or {}
+        self.session = MockSession(session or {})
 
 
 
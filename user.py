@@ -1,12 +1,24 @@
 class User:
-    def __init__(self, user_id, username, password, email, is_admin=False, is_active=True, projects=None):
+    def __init__(self, user_id, username, password, email, is_admin=False, is_active=True, projects=None, projects_loader=None):
         self.user_id = user_id
         self.username = username
         self.password = password
         self.email = email
         self.is_admin = is_admin
         self.is_active = is_active
-        self.projects = projects if projects is not None else []
+        self._projects = projects
+        self._projects_loader = projects_loader
+
+    @property
+    def projects(self):
+        # Loaded on first access, most callers only need the id or username
+        if self._projects is None:
+            self._projects = self._projects_loader() if self._projects_loader is not None else []
+        return self._projects
+
+    @projects.setter
+    def projects(self, projects):
+        self._projects = projects
 
 
    
@@ -85,6 +97,7 @@ class User:
         return {
             "user_id": self.user_id,
             "username": self.username,
+            "email": self.email,
             "is_admin": self.is_admin,
             "is_active": self.is_active,
             "projects": [project.project_id for project in self.projects]
@@ -0,0 +1,81 @@
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindJournal:
+    """Buffers append-only inserts and writes them to SQLite in batched transactions.
+
+    A background thread flushes once max_batch rows are queued or max_delay seconds
+    have passed. Readers call flush() first so they always see their own writes.
+    """
+
+    def __init__(self, db, max_batch=500, max_delay=0.5):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = {}
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="trellomize-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, query, row):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("write-behind journal is closed")
+            self._pending.setdefault(query, []).append(row)
+            self._pending_count += 1
+            full = self._pending_count >= self.max_batch
+        if full:
+            self._wakeup.set()
+
+    def pending_count(self):
+        return self._pending_count
+
+    def flush(self):
+        # The flush lock keeps batches in append order even when a reader and the
+        # background thread flush at the same time
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_count = 0
+            if not pending:
+                return
+            try:
+                with self.db.transaction():
+                    for query, rows in pending.items():
+                        self.db.conn.executemany(query, rows)
+            except Exception:
+                logger.exception(f"Failed to flush {sum(len(rows) for rows in pending.values())} buffered rows, keeping them for the next flush")
+                with self._lock:
+                    for query, rows in self._pending.items():
+                        pending.setdefault(query, []).extend(rows)
+                    self._pending = pending
+                    self._pending_count = sum(len(rows) for rows in pending.values())
+                raise
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.max_delay)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)